@@ -1,18 +1,30 @@
 import streamlit as st
 import mysql.connector
-import hashlib
-from datetime import datetime
+from datetime import datetime, timedelta
 import pandas as pd
-from PIL import Image, ImageFont, ImageDraw
 import os
 import streamlit.components.v1 as components
 import plotly.graph_objects as go
 from urllib.parse import urlparse, parse_qs
 from config import get_database_connection
+from migrations import ensure_schema, hash_password
+from scoring import bump_scoring_version
+from match_results import collect_player_stats, apply_match_result
+from scoring_rules import get_rules
+from team_optimizer import optimize_team, FORMATION_442
+from player_catalog import get_player_catalog
+from pitch_renderer import render_pitch, SLOT_COORDS
+from logo_cache import get_team_logo, warm_logo_cache
+from leaderboard import get_leaderboard_page, get_user_rank, invalidate_user_ranks, PAGE_SIZE
+from selection_stats import record_squad_change
+from dashboard_data import load_dashboard_snapshot
+from job_queue import SCORE_MATCH, enqueue_job, get_job
+from user_profile import start_session, end_session, current_profile, is_admin_user
+from query_stats import begin_rerun, end_rerun, top_queries, page_summary, reset_stats
+from log_config import get_logger
 from pymysql.cursors import DictCursor
 
-# Constants for file paths
-LOGO_DIR = "team_logos"  # Directory containing team logos
+log = get_logger("admin")
 
 # # Database Configuration
 # def get_database_connection():
@@ -23,108 +35,11 @@ LOGO_DIR = "team_logos"  # Directory containing team logos
 #         database="fantasy_appc"
 #     )
 
-# Initialize database tables
-def init_db():
-    conn = get_database_connection()
-    cursor = conn.cursor()
-    
-    # Create users table if not exists
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            username VARCHAR(50) UNIQUE NOT NULL,
-            password VARCHAR(255) NOT NULL,
-            points INT DEFAULT 0,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS players (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(100) NOT NULL,
-            team VARCHAR(100) NOT NULL,
-            position ENUM('GK', 'DEF', 'MID', 'FWD') NOT NULL,
-            price DECIMAL(10,2) NOT NULL,
-            points INT DEFAULT 0
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_teams (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id INT NOT NULL,
-            player_id INT NOT NULL,
-            position_order INT NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users(id),
-            FOREIGN KEY (player_id) REFERENCES players(id)
-        )
-    """)
-    
-    # Modified matches table to store local image paths
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS matches (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            home_team VARCHAR(100) NOT NULL,
-            away_team VARCHAR(100) NOT NULL,
-            match_time DATETIME NOT NULL,
-            home_logo VARCHAR(255),
-            away_logo VARCHAR(255),
-            status ENUM('upcoming', 'live', 'completed') DEFAULT 'upcoming'
-        )
-    """)
-
-    # Add new table for squad history
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS squad_history (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            user_id INT NOT NULL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            total_points INT DEFAULT 0,
-            locked_until DATETIME NOT NULL,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS squad_players (
-            squad_id INT NOT NULL,
-            player_id INT NOT NULL,
-            position_order INT NOT NULL,
-            points_earned INT DEFAULT 0,
-            FOREIGN KEY (squad_id) REFERENCES squad_history(id),
-            FOREIGN KEY (player_id) REFERENCES players(id),
-            PRIMARY KEY (squad_id, player_id)
-        )
-    """)
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-    # Set up admin user
-    setup_admin()
-
-# Helper function to load team logo
+# Helper function to load team logo (pre-resized thumbnail from the logo cache)
 def load_team_logo(team_name):
-    try:
-        # Convert team name to filename format (lowercase, no spaces)
-        filename = f"{team_name.lower().replace(' ', '')}.jpg"
-        image_path = os.path.join(LOGO_DIR, filename)
-        
-        # Check if file exists
-        if os.path.exists(image_path):
-            return Image.open(image_path)
-        else:
-            # Return a default image or placeholder
-            return None
-    except Exception as e:
-        st.error(f"Error loading logo for {team_name}: {str(e)}")
-        return None
+    return get_team_logo(team_name, width=50)
 
 # Authentication functions remain the same
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
 def register_user(username, password):
     conn = get_database_connection()
     cursor = conn.cursor()
@@ -136,6 +51,7 @@ def register_user(username, password):
             (username, hashed_pw)
         )
         conn.commit()
+        invalidate_user_ranks()
         return True
     except mysql.connector.Error as err:
         st.error(f"Registration failed: {err}")
@@ -159,27 +75,11 @@ def login_user(username, password):
     conn.close()
     return user
 
-def get_leaderboard():
-    conn = get_database_connection()
-    cursor = conn.cursor(DictCursor)
-    
-    cursor.execute("""
-        SELECT username, points
-        FROM users
-        ORDER BY points DESC
-        LIMIT 10
-    """)
-    
-    leaderboard = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return leaderboard
-
 def get_popular_players():
     conn = get_database_connection()
     cursor = conn.cursor(DictCursor)
     
-    # Get most selected players
+    # Get most selected players from the maintained counters
     cursor.execute("""
         SELECT 
             p.name,
@@ -187,15 +87,15 @@ def get_popular_players():
             p.team,
             p.price,
             p.points,
-            COUNT(sp.player_id) as selection_count,
-            COUNT(sp.player_id) * 100.0 / (
-                SELECT COUNT(DISTINCT user_id) 
-                FROM squad_history
-            ) as selection_percentage
-        FROM players p
-        LEFT JOIN squad_players sp ON p.id = sp.player_id
-        GROUP BY p.id
-        ORDER BY selection_count DESC
+            s.current_owners as selection_count,
+            s.current_owners * 100.0 / NULLIF((
+                SELECT value
+                FROM league_counters
+                WHERE name = 'active_managers'
+            ), 0) as selection_percentage
+        FROM player_selection_stats s
+        JOIN players p ON p.id = s.player_id
+        ORDER BY s.current_owners DESC
         LIMIT 10
     """)
     
@@ -204,34 +104,6 @@ def get_popular_players():
     conn.close()
     return popular_players
 
-# Add these SQL commands to set up the admin user
-def setup_admin():
-    conn = get_database_connection()
-    cursor = conn.cursor()
-    
-    # First, add is_admin column if it doesn't exist
-    try:
-        cursor.execute("""
-            ALTER TABLE users
-            ADD COLUMN IF NOT EXISTS is_admin BOOLEAN DEFAULT FALSE
-        """)
-        
-        # Create an admin user if it doesn't exist
-        cursor.execute("""
-            INSERT INTO users (username, password, is_admin)
-            SELECT 'admin', %s, TRUE
-            WHERE NOT EXISTS (
-                SELECT 1 FROM users WHERE username = 'admin'
-            )
-        """, (hash_password('admin123'),))
-        
-        conn.commit()
-    except Exception as e:
-        print(f"Error setting up admin: {str(e)}")
-    finally:
-        cursor.close()
-        conn.close()
-
 def get_top_scoring_players():
     conn = get_database_connection()
     cursor = conn.cursor(DictCursor)
@@ -254,10 +126,9 @@ def get_top_scoring_players():
     return top_scorers
 
 # Add these visualizations to your dashboard
-def add_dashboard_visualizations():
+def add_dashboard_visualizations(popular_players, top_scorers):
     # Popular Players
     st.header("Most Selected Players")
-    popular_players = get_popular_players()
     if popular_players:
         df_popular = pd.DataFrame(popular_players)
         fig = go.Figure(data=[
@@ -278,7 +149,6 @@ def add_dashboard_visualizations():
     
     # Top Scoring Players
     st.header("Top Scoring Players")
-    top_scorers = get_top_scoring_players()
     if top_scorers:
         df_scores = pd.DataFrame(top_scorers)
         fig = go.Figure(data=[
@@ -325,17 +195,12 @@ def get_team_composition_stats(user_id):
         SELECT 
             p.team,
             COUNT(*) as player_count
-        FROM squad_history sh
-        JOIN squad_players sp ON sh.id = sp.squad_id
+        FROM users u
+        JOIN squad_players sp ON sp.squad_id = u.current_squad_id
         JOIN players p ON sp.player_id = p.id
-        WHERE sh.user_id = %s
-        AND sh.created_at = (
-            SELECT MAX(created_at)
-            FROM squad_history
-            WHERE user_id = %s
-        )
+        WHERE u.id = %s
         GROUP BY p.team
-    """, (user_id, user_id))
+    """, (user_id,))
     
     composition = cursor.fetchall()
     cursor.close()
@@ -397,45 +262,22 @@ def get_youtube_id(url):
 
 # Add these new functions
 def get_available_players(position):
-    conn = get_database_connection()
-    cursor = conn.cursor(DictCursor)
-    
-    cursor.execute("""
-        SELECT * FROM players 
-        WHERE position = %s 
-        ORDER BY points DESC
-    """, (position,))
-    
-    players = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    # Convert Decimal prices to float
-    for player in players:
-        player['price'] = float(player['price'])
-    return players
+    # Served from the in-memory catalog; no query per call
+    return get_player_catalog().for_position(position)
 
 def get_player_by_id(player_id):
-    conn = get_database_connection()
-    cursor = conn.cursor(DictCursor)
-    cursor.execute("SELECT * FROM players WHERE id = %s", (player_id,))
-    player = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    if player:
-        player['price'] = float(player['price'])  # Convert Decimal to float
-    return player
+    return get_player_catalog().get(player_id)
 
 # Add these new functions for squad management
 def get_current_squad_lock(user_id):
     conn = get_database_connection()
     cursor = conn.cursor(DictCursor)
     
+    # Single primary-key read of the pointer kept by save_squad_history
     cursor.execute("""
         SELECT locked_until 
-        FROM squad_history 
-        WHERE user_id = %s 
-        ORDER BY created_at DESC 
-        LIMIT 1
+        FROM users 
+        WHERE id = %s
     """, (user_id,))
     
     result = cursor.fetchone()
@@ -455,6 +297,16 @@ def save_squad_history(user_id, selected_players):
         from datetime import datetime, timedelta
         lock_until = datetime.now() + timedelta(days=1)
         
+        # Squad being replaced; locking the user row also serializes
+        # concurrent saves by the same user
+        cursor.execute("""
+            SELECT current_squad_id FROM users
+            WHERE id = %s
+            FOR UPDATE
+        """, (user_id,))
+        previous = cursor.fetchone()
+        previous_squad_id = previous[0] if previous else None
+        
         # Insert into squad_history
         cursor.execute("""
             INSERT INTO squad_history (user_id, locked_until)
@@ -464,112 +316,26 @@ def save_squad_history(user_id, selected_players):
         squad_id = cursor.lastrowid
         
         # Insert all players
-        for pos_order, player_id in enumerate(selected_players):
-            cursor.execute("""
-                INSERT INTO squad_players (squad_id, player_id, position_order)
-                VALUES (%s, %s, %s)
-            """, (squad_id, player_id, pos_order))
+        cursor.executemany("""
+            INSERT INTO squad_players (squad_id, player_id, position_order)
+            VALUES (%s, %s, %s)
+        """, [(squad_id, player_id, pos_order) for pos_order, player_id in enumerate(selected_players)])
         
-        conn.commit()
-        return True, lock_until
-    except Exception as e:
-        conn.rollback()
-        return False, str(e)
-    finally:
-        cursor.close()
-        conn.close()
-
-def update_user_points():
-    """Update points for all users based on their current squad's performance"""
-    conn = get_database_connection()
-    cursor = conn.cursor(DictCursor)
-    
-    try:
-        # Get all users with their latest squad
+        # Point the user at the new squad
         cursor.execute("""
-            SELECT DISTINCT u.id as user_id, u.username
-            FROM users u
-            JOIN squad_history sh ON u.id = sh.user_id
-        """)
-        users = cursor.fetchall()
+            UPDATE users
+            SET current_squad_id = %s, locked_until = %s
+            WHERE id = %s
+        """, (squad_id, lock_until, user_id))
         
-        print(f"Found {len(users)} users with squads")  # Debug print
-        
-        for user in users:
-            print(f"Processing user: {user['username']}")  # Debug print
-            
-            # Get user's latest squad
-            cursor.execute("""
-                SELECT 
-                    sh.id as squad_id,
-                    p.id as player_id,
-                    p.name as player_name,
-                    p.points as player_points,
-                    COALESCE(sp.points_earned, 0) as points_already_earned
-                FROM squad_history sh
-                JOIN squad_players sp ON sh.id = sp.squad_id
-                JOIN players p ON sp.player_id = p.id
-                WHERE sh.user_id = %s
-                AND sh.created_at = (
-                    SELECT MAX(created_at)
-                    FROM squad_history
-                    WHERE user_id = %s
-                )
-            """, (user['user_id'], user['user_id']))
-            
-            squad = cursor.fetchall()
-            
-            if squad:
-                print(f"Found squad with {len(squad)} players")  # Debug print
-                total_new_points = 0
-                
-                # Calculate new points earned
-                for player in squad:
-                    points_to_add = player['player_points'] - player['points_already_earned']
-                    print(f"Player: {player['player_name']}, Current points: {player['player_points']}, "
-                          f"Already earned: {player['points_already_earned']}, To add: {points_to_add}")  # Debug print
-                    
-                    if points_to_add > 0:
-                        total_new_points += points_to_add
-                        
-                        # Update points_earned in squad_players
-                        cursor.execute("""
-                            UPDATE squad_players 
-                            SET points_earned = %s
-                            WHERE squad_id = %s AND player_id = %s
-                        """, (player['player_points'], player['squad_id'], player['player_id']))
-                
-                print(f"Total new points to add: {total_new_points}")  # Debug print
-                
-                if total_new_points > 0:
-                    # Update total points for the squad
-                    cursor.execute("""
-                        UPDATE squad_history
-                        SET total_points = total_points + %s
-                        WHERE id = %s
-                    """, (total_new_points, squad[0]['squad_id']))
-                    
-                    # Update user's total points
-                    cursor.execute("""
-                        UPDATE users
-                        SET points = points + %s
-                        WHERE id = %s
-                    """, (total_new_points, user['user_id']))
-                    
-                    print(f"Updated points for user {user['username']}")  # Debug print
-            else:
-                print(f"No current squad found for user {user['username']}")  # Debug print
+        # Keep player_selection_stats in step, in the same transaction
+        record_squad_change(cursor, previous_squad_id, selected_players)
         
         conn.commit()
-        return True
-        
+        return True, lock_until
     except Exception as e:
-        print(f"Error updating user points: {str(e)}")
-        print(f"Error type: {type(e)}")  # Print error type
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")  # Print full traceback
         conn.rollback()
-        return False
+        return False, str(e)
     finally:
         cursor.close()
         conn.close()
@@ -622,51 +388,21 @@ def suggest_team(budget=100.0):
     """
     all_players = get_all_players_with_stats()
     
-    # Separate players by position
-    goalkeepers = [p for p in all_players if p['position'] == 'GK']
-    defenders = [p for p in all_players if p['position'] == 'DEF']
-    midfielders = [p for p in all_players if p['position'] == 'MID']
-    forwards = [p for p in all_players if p['position'] == 'FWD']
-    
-    # Sort each list by rating
-    goalkeepers.sort(key=lambda x: x['rating'], reverse=True)
-    defenders.sort(key=lambda x: x['rating'], reverse=True)
-    midfielders.sort(key=lambda x: x['rating'], reverse=True)
-    forwards.sort(key=lambda x: x['rating'], reverse=True)
-    
-    def try_combination(gk, defs, mids, fwds):
-        """Check if a combination of players fits within budget"""
-        total_cost = (
-            gk['price'] +
-            sum(p['price'] for p in defs) +
-            sum(p['price'] for p in mids) +
-            sum(p['price'] for p in fwds)
-        )
-        return total_cost <= budget
-    
-    # Start with the best rated players
-    suggested_gk = goalkeepers[0]
-    suggested_defs = defenders[:4]
-    suggested_mids = midfielders[:4]
-    suggested_fwds = forwards[:2]
-    
-    # If over budget, try different combinations
-    if not try_combination(suggested_gk, suggested_defs, suggested_mids, suggested_fwds):
-        # Try different combinations by replacing expensive players with next best options
-        for gk in goalkeepers:
-            for i in range(len(defenders) - 3):
-                for j in range(len(midfielders) - 3):
-                    for k in range(len(forwards) - 1):
-                        current_defs = defenders[i:i+4]
-                        current_mids = midfielders[j:j+4]
-                        current_fwds = forwards[k:k+2]
-                        
-                        if try_combination(gk, current_defs, current_mids, current_fwds):
-                            suggested_gk = gk
-                            suggested_defs = current_defs
-                            suggested_mids = current_mids
-                            suggested_fwds = current_fwds
-                            break
+    # Exact rating-maximising 4-4-2 within budget
+    squad = optimize_team(all_players, budget=budget, formation=FORMATION_442)
+    
+    if squad is None:
+        # Nothing fits the budget; fall back to the best rated players
+        by_rating = sorted(all_players, key=lambda x: x['rating'], reverse=True)
+        squad = {
+            position: [p for p in by_rating if p['position'] == position][:count]
+            for position, count in FORMATION_442.items()
+        }
+    
+    suggested_gk = squad['GK'][0]
+    suggested_defs = squad['DEF']
+    suggested_mids = squad['MID']
+    suggested_fwds = squad['FWD']
     
     return {
         'GK': suggested_gk,
@@ -766,38 +502,20 @@ def save_user_team(user_id, selected_players):
         cursor.close()
         conn.close()
 
-def is_admin(username):
-    """Check if the user is an admin"""
-    conn = get_database_connection()
-    cursor = conn.cursor(DictCursor)
-    
-    try:
-        cursor.execute("""
-            SELECT is_admin FROM users WHERE username = %s
-        """, (username,))
-        
-        result = cursor.fetchone()
-        # Add debug print
-        print(f"Admin check for {username}: {result}")
-        return result and result['is_admin'] == 1
-    except Exception as e:
-        print(f"Error checking admin status: {e}")
-        return False
-    finally:
-        cursor.close()
-        conn.close()
-
 def get_matches_for_date(date):
     """Get all matches scheduled for a specific date"""
     conn = get_database_connection()
     cursor = conn.cursor(DictCursor)
     
+    # Half-open range on match_time so the index can be used (DATE() can't)
+    day_start = datetime.combine(date, datetime.min.time())
     cursor.execute("""
         SELECT id, home_team, away_team, match_time
         FROM matches
-        WHERE DATE(match_time) = DATE(%s)
+        WHERE match_time >= %s
+        AND match_time < %s
         AND status != 'completed'
-    """, (date,))
+    """, (day_start, day_start + timedelta(days=1)))
     
     matches = cursor.fetchall()
     cursor.close()
@@ -820,36 +538,6 @@ def get_team_players(team):
     conn.close()
     return players
 
-def update_player_points(player_id, points_to_add):
-    """Update player points"""
-    conn = get_database_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        UPDATE players
-        SET points = points + %s
-        WHERE id = %s
-    """, (points_to_add, player_id))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-def record_match_result(match_id, home_score, away_score, status='completed'):
-    """Record the match result"""
-    conn = get_database_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        UPDATE matches
-        SET home_score = %s, away_score = %s, status = %s
-        WHERE id = %s
-    """, (home_score, away_score, status, match_id))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-
 def show_sidebar_navigation():
     """
     Show consistent sidebar navigation based on current page and user status
@@ -873,7 +561,7 @@ def show_sidebar_navigation():
                 st.rerun()
             
             # Admin button only shown for admin users
-            if is_admin(st.session_state.user['username']):
+            if is_admin_user():
                 if st.button("🔐 Admin Panel", key="nav_admin", type="primary"):
                     st.session_state.page = 'admin'
                     st.rerun()
@@ -930,7 +618,7 @@ def show_sidebar_navigation():
                     st.rerun()
             
             if st.button("🚪 Logout", key="nav_logout", type="secondary"):
-                st.session_state.user = None
+                end_session()
                 st.session_state.page = 'login'
                 st.rerun()
 
@@ -939,16 +627,6 @@ def get_match_highlights():
     conn = get_database_connection()
     cursor = conn.cursor(DictCursor)
     
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS match_highlights (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            title VARCHAR(255) NOT NULL,
-            youtube_url VARCHAR(255) NOT NULL,
-            match_date DATE NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
     cursor.execute("""
         SELECT * FROM match_highlights 
         ORDER BY match_date DESC 
@@ -960,13 +638,10 @@ def get_match_highlights():
     conn.close()
     return highlights
 
-def show_highlights_section():
+def show_highlights_section(highlights):
     """Display match highlights with video player"""
     st.header("Match Highlights")
     
-    # Get highlights from database
-    highlights = get_match_highlights()
-    
     if not highlights:
         # Sample data if no highlights in database
         highlights = [
@@ -1168,20 +843,8 @@ def show_create_team():
     with col1:
         st.subheader("Team Formation (4-4-2)")
         
-        # Load and modify pitch image
+        # Render the pitch (cached per ordered set of names)
         try:
-            pitch_image = Image.open("football_pitch.jpg")
-            draw = ImageDraw.Draw(pitch_image)
-            
-            # Define positions for 4-4-2 formation
-            positions = {
-                'GK': [(130, 490)],
-                'DEF': [(40, 380), (90, 410), (210, 410), (300, 380)],
-                'MID': [(30, 230), (90, 290), (240, 290), (300, 230)],
-                'FWD': [(100, 130), (220, 130)]
-            }
-            
-            # Function to get player name
             def get_player_name(player_id):
                 if player_id:
                     player = get_player_by_id(player_id)
@@ -1189,28 +852,12 @@ def show_create_team():
                         return player['name']
                 return ""
             
-            # Draw players on pitch
-            try:
-                font = ImageFont.truetype("arial.ttf", 12)
-            except IOError:
-                font = ImageFont.load_default()
-            
-            # Draw GK
-            if st.session_state.selected_players['GK']:
-                name = get_player_name(st.session_state.selected_players['GK'])
-                draw.text(positions['GK'][0], name, fill="white", font=font)
-            
-            # Draw other positions
-            for position, coords_list in positions.items():
-                if position != 'GK':
-                    players = st.session_state.selected_players[position]
-                    for idx, coords in enumerate(coords_list):
-                        if idx < len(players) and players[idx]:
-                            name = get_player_name(players[idx])
-                            draw.text(coords, name, fill="white", font=font)
+            selected = st.session_state.selected_players
+            slot_ids = [selected['GK']] + selected['DEF'] + selected['MID'] + selected['FWD']
+            names = tuple(get_player_name(player_id) for player_id in slot_ids)
             
             # Display the pitch image
-            st.image(pitch_image, use_container_width=True)
+            st.image(render_pitch(names), use_container_width=True)
             
         except Exception as e:
             st.error(f"Error loading pitch image: {str(e)}")
@@ -1331,17 +978,12 @@ def display_locked_squad():
     
     cursor.execute("""
         SELECT p.*, sp.position_order
-        FROM squad_history sh
-        JOIN squad_players sp ON sh.id = sp.squad_id
+        FROM users u
+        JOIN squad_players sp ON sp.squad_id = u.current_squad_id
         JOIN players p ON sp.player_id = p.id
-        WHERE sh.user_id = %s
-        AND sh.created_at = (
-            SELECT MAX(created_at)
-            FROM squad_history
-            WHERE user_id = %s
-        )
+        WHERE u.id = %s
         ORDER BY sp.position_order
-    """, (st.session_state.user['id'], st.session_state.user['id']))
+    """, (st.session_state.user['id'],))
     
     players = cursor.fetchall()
     cursor.close()
@@ -1353,42 +995,58 @@ def display_locked_squad():
     
     # Display squad using the same visualization as create_team
     try:
-        pitch_image = Image.open("football_pitch.jpg")
-        draw = ImageDraw.Draw(pitch_image)
-        
-        positions = {
-            'GK': [(130, 490)],
-            'DEF': [(40, 380), (90, 410), (210, 410), (300, 380)],
-            'MID': [(30, 230), (90, 290), (240, 290), (300, 230)],
-            'FWD': [(100, 130), (220, 130)]
-        }
-        
-        try:
-            font = ImageFont.truetype("arial.ttf", 12)
-        except IOError:
-            font = ImageFont.load_default()
-        
-        # Draw players on pitch based on position_order
+        names = [""] * len(SLOT_COORDS)
         for player in players:
-            pos_order = player['position_order']
-            if pos_order == 0:  # Goalkeeper
-                draw.text(positions['GK'][0], player['name'], fill="white", font=font)
-            elif pos_order <= 4:  # Defenders
-                draw.text(positions['DEF'][pos_order-1], player['name'], fill="white", font=font)
-            elif pos_order <= 8:  # Midfielders
-                draw.text(positions['MID'][pos_order-5], player['name'], fill="white", font=font)
-            else:  # Forwards
-                draw.text(positions['FWD'][pos_order-9], player['name'], fill="white", font=font)
+            names[player['position_order']] = player['name']
         
-        st.image(pitch_image, use_container_width=True)
+        st.image(render_pitch(tuple(names)), use_container_width=True)
         
     except Exception as e:
         st.error(f"Error displaying squad: {str(e)}")
 
+def leaderboard_cursors():
+    """Keyset cursors (page start keys) of the pages the user has browsed"""
+    if 'leaderboard_cursors' not in st.session_state:
+        st.session_state.leaderboard_cursors = [None]
+    return st.session_state.leaderboard_cursors
+
+def show_leaderboard(leaderboard, error=None):
+    """Keyset-paginated leaderboard rendered as a (virtualized) dataframe"""
+    cursors = leaderboard_cursors()
+    page_index = len(cursors) - 1
+    
+    if error:
+        # A failed read is not an empty page; keep the user's position
+        st.error(f"Could not load the leaderboard: {error}")
+        return
+
+    if not leaderboard:
+        if page_index == 0:
+            st.info("No leaderboard data available yet")
+            return
+        # Ran past the end (e.g. users deleted); go back a page
+        cursors.pop()
+        st.rerun()
+    
+    df = pd.DataFrame(leaderboard)[['username', 'points']]
+    first_rank = page_index * PAGE_SIZE + 1
+    df.index = range(first_rank, first_rank + len(df))  # Add ranking
+    st.dataframe(df, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if page_index > 0 and st.button("◀ Previous", key="leaderboard_prev"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        if len(leaderboard) == PAGE_SIZE and st.button("Next ▶", key="leaderboard_next"):
+            last = leaderboard[-1]
+            cursors.append((last['points'], last['id']))
+            st.rerun()
+
 # Add a new section to the dashboard to show squad history
-def show_squad_history():
+def show_squad_history(history):
     st.header("Squad History")
-    history = get_user_squad_history(st.session_state.user['id'])
     
     if not history:
         st.info("No squad history available yet")
@@ -1405,18 +1063,34 @@ def show_squad_history():
                 st.write(f"{player_name}: {points} pts")
 
 # Dashboard page with fixed image handling
+def dashboard_queries(user, leaderboard_after=None):
+    """The dashboard's independent reads, keyed by section"""
+    return {
+        'rank': lambda: get_user_rank(user['points']),
+        'leaderboard': lambda: get_leaderboard_page(after=leaderboard_after),
+        'popular_players': get_popular_players,
+        'top_scorers': get_top_scoring_players,
+        'upcoming_matches': get_upcoming_matches,
+        'highlights': get_match_highlights,
+        'squad_history': lambda: get_user_squad_history(user['id']),
+    }
+
+
 def show_dashboard():
     st.title(f"Welcome, {st.session_state.user['username']}!")
 
     # Show sidebar navigation
     show_sidebar_navigation()
 
-    # Debug prints
-    print(f"Current user: {st.session_state.user['username']}")
-    print(f"Is admin check: {is_admin(st.session_state.user['username'])}")
+    user = st.session_state.user
+    leaderboard_after = leaderboard_cursors()[-1]
     
+    # Independent reads run concurrently; the page waits for the slowest one
+    data = load_dashboard_snapshot(dashboard_queries(user, leaderboard_after))
+    if data.errors:
+        st.warning("Some sections could not be loaded: " + ", ".join(sorted(data.errors)))
 
-    if is_admin(st.session_state.user['username']):
+    if is_admin_user():
         if st.button("🔐 Access Admin Panel", type="primary"):
             st.session_state.page = 'admin'
             st.rerun()
@@ -1428,28 +1102,27 @@ def show_dashboard():
             f"""
             <div style="text-align: center; padding: 20px; background-color: #f0f2f6; border-radius: 10px;">
                 <h2 style="color: #1f77b4;">Your Total Points</h2>
-                <h1 style="color: #2ecc71;">{st.session_state.user['points']} pts</h1>
+                <h1 style="color: #2ecc71;">{user['points']} pts</h1>
             </div>
             """,
             unsafe_allow_html=True
         )
+    with col3:
+        my_rank = data.rank
+        if my_rank:
+            st.metric("Your Rank", f"#{my_rank['rank']} of {my_rank['total']}")
+            st.caption(f"Ahead of {my_rank['percentile']:.1f}% of managers")
     
     # Leaderboard
     st.header("Leaderboard")
-    leaderboard = get_leaderboard()
-    if leaderboard:
-        df = pd.DataFrame(leaderboard)
-        df.index = range(1, len(df) + 1)  # Add ranking
-        st.table(df)
-    else:
-        st.info("No leaderboard data available yet")
+    show_leaderboard(data.leaderboard, data.errors.get('leaderboard'))
 
     # Add visualizations
-    add_dashboard_visualizations()
+    add_dashboard_visualizations(data.popular_players, data.top_scorers)
     
     # Upcoming Matches
     st.header("Upcoming Matches")
-    matches = get_upcoming_matches()
+    matches = data.upcoming_matches
     if matches:
         for match in matches:
             col1, col2, col3 = st.columns([2,1,2])
@@ -1473,9 +1146,9 @@ def show_dashboard():
         st.info("No upcoming matches scheduled")
     
     # Replace the old highlights section with the new one
-    show_highlights_section()
+    show_highlights_section(data.highlights)
     
-    show_squad_history()
+    show_squad_history(data.squad_history)
     
 
 def show_admin_page():
@@ -1485,16 +1158,26 @@ def show_admin_page():
     # Show sidebar navigation
     show_sidebar_navigation()
     
-    if not st.session_state.user or not is_admin(st.session_state.user['username']):
+    if not is_admin_user():
         st.error("Access denied. Admin privileges required.")
         return
     
     # Add tabs for different admin functions
-    admin_tabs = st.tabs(["Match Points", "Highlights Management","Upcoming Matches"])
+    admin_tabs = st.tabs(["Match Points", "Highlights Management","Upcoming Matches", "Query Stats"])
 
     with admin_tabs[0]:
         # Your existing match points code
-        
+        job_id = st.session_state.get('scoring_job_id')
+        finished = st.session_state.get('scoring_job_result')
+        if finished and finished['id'] == job_id:
+            show_scoring_job_result(finished)
+        elif job_id:
+            show_scoring_job_status()
+
+        with st.expander("Scoring rules"):
+            rules = get_rules()
+            st.caption(f"Points per event and position, from {os.path.basename(rules.source)}")
+            st.dataframe(rules.table())
 
         # Match date selection
         match_date = st.date_input("Select Match Date")
@@ -1584,69 +1267,35 @@ def show_admin_page():
                 
                 if submit:
                     try:
-                        # Record match result
-                        record_match_result(selected_match['id'], home_score, away_score)
-                        
-                        # Process clean sheets (if applicable)
-                        if home_score == 0:
-                            # Away team clean sheet
-                            for player in away_players:
-                                if player['position'] == 'GK':
-                                    update_player_points(player['id'], 4)
-                                elif player['position'] == 'DEF':
-                                    update_player_points(player['id'], 3)
+                        # Per-player match stats, stored with the match result;
+                        # players.points moves by the net change in one transaction
+                        stats = collect_player_stats(
+                            home_players, away_players, home_score, away_score,
+                            scorers=home_scorers + away_scorers,
+                            assists=home_assists + away_assists,
+                            yellows=home_yellows + away_yellows,
+                            reds=home_reds + away_reds,
+                        )
+                        deltas = apply_match_result(selected_match['id'], home_score, away_score, stats)
+                        log.info("Match result recorded", extra={
+                            'match_id': selected_match['id'],
+                            'home_score': home_score,
+                            'away_score': away_score,
+                            'players': len(deltas),
+                        })
                         
-                        if away_score == 0:
-                            # Home team clean sheet
-                            for player in home_players:
-                                if player['position'] == 'GK':
-                                    update_player_points(player['id'], 4)
-                                elif player['position'] == 'DEF':
-                                    update_player_points(player['id'], 3)
-                        
-                        # Process goals and assists
-                        for scorer in home_scorers + away_scorers:
-                            player = next((p for p in home_players + away_players if p['name'] == scorer), None)
-                            if player:
-                                update_player_points(player['id'], 5)
-                        
-                        for assist in home_assists + away_assists:
-                            player = next((p for p in home_players + away_players if p['name'] == assist), None)
-                            if player:
-                                update_player_points(player['id'], 2)
-                        
-                        # Process cards
-                        for yellow in home_yellows + away_yellows:
-                            player = next((p for p in home_players + away_players if p['name'] == yellow), None)
-                            if player:
-                                update_player_points(player['id'], -3)
-                        
-                        for red in home_reds + away_reds:
-                            player = next((p for p in home_players + away_players if p['name'] == red), None)
-                            if player:
-                                update_player_points(player['id'], -5)
-                        
-                        # Add default points for all other players
-                        for player in home_players + away_players:
-                            if (player['name'] not in home_scorers + away_scorers + 
-                                home_assists + away_assists + 
-                                home_yellows + away_yellows + 
-                                home_reds + away_reds):
-                                update_player_points(player['id'], 2)
-                        
-                        st.info("Processing user points updates...")  # Add status message
-                        
-                        # Update user points after all player points are updated
-                        if update_user_points():
-                            st.success("Match result and points updated successfully!")
-                        else:
-                            st.warning("""
-                                Match result saved but there was an error updating user points.
-                                Please check the server logs for details.
-                                You may need to manually update user points.
-                            """)
+                        # User points are updated by the background worker
+                        # (scoring_worker.py). Only squads holding players from
+                        # these two clubs can change.
+                        match_player_ids = [p['id'] for p in home_players + away_players]
+                        st.session_state.scoring_job_id = enqueue_job(SCORE_MATCH, {
+                            'match_id': selected_match['id'],
+                            'player_ids': match_player_ids,
+                        })
+                        st.success("Match result saved. User points are being updated in the background.")
                             
                     except Exception as e:
+                        log.exception("Error updating match result", extra={'match_id': selected_match['id']})
                         import traceback
                         error_details = traceback.format_exc()
                         st.error(f"""
@@ -1690,6 +1339,62 @@ def show_admin_page():
                     st.success("Upcoming match added successfully!")
                 except Exception as e:
                     st.error(f"Error adding match: {str(e)}")
+
+    with admin_tabs[3]:
+        show_query_stats()
+
+
+@st.fragment(run_every=2)
+def show_scoring_job_status():
+    """Polls the admin's latest scoring job until it finishes; only this fragment reruns"""
+    job = get_job(st.session_state.scoring_job_id)
+    if job is None:
+        return
+
+    match_id = job['payload'].get('match_id')
+    if job['status'] == 'queued':
+        st.info(f"Scoring for match {match_id} is queued, waiting for the scoring worker...")
+    elif job['status'] == 'running':
+        total = job['total'] or 0
+        fraction = min(job['progress'] / total, 1.0) if total else 0.0
+        st.progress(fraction, text=job['message'] or f"Scoring match {match_id}")
+    else:
+        # Finished: keep the outcome and rerun the page without this fragment,
+        # which stops the polling
+        st.session_state.scoring_job_result = job
+        if job['status'] == 'succeeded':
+            # Points changed in the worker process; refresh cached profiles
+            bump_scoring_version()
+        st.rerun()
+
+
+def show_scoring_job_result(job):
+    if job['status'] == 'succeeded':
+        st.success(job['message'] or "User points updated successfully!")
+    else:
+        st.warning(f"""
+            Match result saved but there was an error updating user points:
+            {job['error']}
+            Please check the worker logs for details.
+        """)
+
+
+def show_query_stats():
+    st.subheader("Queries per page rerun")
+    pages = page_summary()
+    if pages:
+        st.dataframe(pd.DataFrame(pages), hide_index=True, use_container_width=True)
+    else:
+        st.info("No reruns recorded yet")
+
+    st.subheader("Top queries by total time")
+    queries = top_queries()
+    if queries:
+        st.dataframe(pd.DataFrame(queries), hide_index=True, use_container_width=True)
+
+    if st.button("Reset query stats"):
+        reset_stats()
+        st.rerun()
     
 
 # Session state initialization
@@ -1711,7 +1416,7 @@ def show_login_page():
         if submit:
             user = login_user(username, password)
             if user:
-                st.session_state.user = user
+                start_session(user)
                 st.session_state.page = 'dashboard'
                 st.rerun()
             else:
@@ -1824,9 +1529,20 @@ def show_team_analysis():
 
 # Main app
 def main():
-    init_db()
+    ensure_schema()  # Runs migrations once per process, not on every rerun
+    warm_logo_cache()  # Decodes and resizes the club logos once per process
     init_session_state()
-    
+    current_profile()  # Refreshes the cached role / points only when stale
+
+    # Attribute every query issued while rendering to this page rerun
+    token = begin_rerun(st.session_state.page)
+    try:
+        show_page()
+    finally:
+        end_rerun(token)
+
+
+def show_page():
     if st.session_state.page == 'login':
         show_login_page()
     elif st.session_state.page == 'register':
@@ -1850,7 +1566,7 @@ def main():
             st.session_state.page = 'login'
             st.rerun()
     elif st.session_state.page == 'admin':  # Add this new condition
-        if st.session_state.user and is_admin(st.session_state.user['username']):
+        if is_admin_user():
             show_admin_page()
         else:
             st.error("Access denied. Admin privileges required.")
@@ -0,0 +1,169 @@
+"""
+Benchmark: parallel (partitioned) scoring vs the single-statement set mode.
+
+    DB_NAME=fantasy_bench python benchmarks/bench_parallel_scoring.py --workers 1 2 4 8
+
+Workers x league size matrix (one database per size), appended to one file:
+
+    for n in 10000 50000 100000; do
+        DB_NAME=fantasy_bench_$n python benchmarks/bench_parallel_scoring.py \
+            --users $n --output parallel_scoring.json
+    done
+
+Seeds a --users league with seed_league.py if the database has no squads yet.
+Before every run all credited points are reset (points_earned, squad totals
+and users.points back to 0), so each run credits the whole league. That is
+destructive, so the benchmark refuses to run against a database with users
+that seed_league.py did not create, unless --force is given.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import get_database_connection  # noqa: E402
+from migrations import ensure_schema  # noqa: E402
+from scoring import update_user_points_set_based, update_user_points_parallel  # noqa: E402
+from seed_league import seed_league  # noqa: E402
+from bench_suite import _git_commit  # noqa: E402
+
+
+def _scalar(cursor, sql):
+    cursor.execute(sql)
+    return cursor.fetchone()[0]
+
+
+def prepare(users, force):
+    ensure_schema()
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        squads = _scalar(cursor, "SELECT COUNT(*) FROM squad_history")
+        foreign = _scalar(cursor, """
+            SELECT COUNT(*) FROM users
+            WHERE username NOT LIKE 'bench\\_user\\_%' AND username <> 'admin'
+        """)
+    finally:
+        cursor.close()
+        conn.close()
+
+    if foreign and not force:
+        raise SystemExit("Database has real users; refusing to reset their points (use --force)")
+    if not squads:
+        seed_league(users=users)
+
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        return _scalar(cursor, "SELECT COUNT(*) FROM users")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def reset_credited_points():
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("UPDATE squad_players SET points_earned = 0")
+        cursor.execute("UPDATE squad_history SET total_points = 0")
+        cursor.execute("UPDATE users SET points = 0")
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def timed(score):
+    reset_credited_points()
+    start = time.perf_counter()
+    summary = score()
+    elapsed = time.perf_counter() - start
+    if summary is None:
+        raise SystemExit("Scoring run failed, see the log output")
+    return elapsed, summary
+
+
+def run(workers_list, repeat, include_set=True):
+    results = []
+    print(f"{'mode':>10} {'workers':>8} {'partitions':>11} {'seconds':>9} {'speedup':>8} {'users':>9} {'points':>12}")
+
+    baseline = None
+    expected = None
+    runs = [('set', None)] if include_set else []
+    runs += [('parallel', workers) for workers in workers_list]
+    for mode, workers in runs:
+        timings = []
+        for _ in range(repeat):
+            if mode == 'set':
+                elapsed, summary = timed(update_user_points_set_based)
+            else:
+                elapsed, summary = timed(lambda: update_user_points_parallel(workers=workers))
+            timings.append(elapsed)
+        best = min(timings)
+
+        # Every mode must credit exactly the same totals
+        totals = (summary['users'], summary['points'])
+        if expected is None:
+            expected = totals
+        elif totals != expected:
+            raise SystemExit(f"{mode} x{workers} credited {totals}, expected {expected}")
+
+        if baseline is None:
+            baseline = best
+        print(f"{mode:>10} {workers or 1:>8} {summary.get('partitions', 1):>11} {best:>9.2f} "
+              f"{baseline / best:>7.2f}x {summary['users']:>9} {summary['points']:>12}")
+        results.append({
+            'mode': mode,
+            'workers': workers or 1,
+            'partitions': summary.get('partitions', 1),
+            'seconds': best,
+            'speedup': baseline / best,
+            'users': summary['users'],
+            'points': summary['points'],
+        })
+    return results
+
+
+def save(path, league_users, repeat, results):
+    """Append this run (one league size, every mode) to the JSON list in `path`"""
+    runs = []
+    if os.path.exists(path):
+        with open(path) as f:
+            runs = json.load(f)
+    runs.append({
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'league_users': league_users,
+        'repeat': repeat,
+        'results': results,
+    })
+    with open(path, "w") as f:
+        json.dump(runs, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000, help="league size to seed if the database is empty")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--no-set", action="store_true", help="skip the single-statement baseline")
+    parser.add_argument("--force", action="store_true", help="run even if the database has real users")
+    parser.add_argument("--output", help="JSON file to append the timings to")
+    args = parser.parse_args()
+    league_users = prepare(args.users, args.force)
+    results = run(args.workers, args.repeat, include_set=not args.no_set)
+    if args.output:
+        save(args.output, league_users, args.repeat, results)
+        print(f"Results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark: exact team optimizer vs the original nested-loop suggest_team.
+
+    python benchmarks/bench_suggest_team.py --sizes 60 120 500 1000
+
+Rosters are synthetic (better players cost more, so the top-rated XI is
+usually over budget, which is the case the old search handled badly). The old
+search is O(G*D*M*F) and is cut off after --legacy-timeout seconds.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from team_optimizer import optimize_team, FORMATION_442  # noqa: E402
+
+POSITION_WEIGHTS = (('GK', 0.1), ('DEF', 0.34), ('MID', 0.34), ('FWD', 0.22))
+
+
+def calculate_player_rating(player):
+    """Same formula as app.calculate_player_rating"""
+    rating = player['points'] * 1.5
+    price = float(player['price'])
+    if price > 0:
+        value_ratio = rating / price
+        rating *= (1 + value_ratio / 10)
+    return rating
+
+
+def synthetic_roster(size, seed=0):
+    rng = random.Random(seed)
+    players = []
+    for i in range(size):
+        position = rng.choices([p for p, _ in POSITION_WEIGHTS],
+                               weights=[w for _, w in POSITION_WEIGHTS])[0]
+        price = rng.choice([x / 2 for x in range(8, 25)])  # 4.0 - 12.0 in 0.5 steps
+        points = max(0, int(rng.gauss(price * 6, 12)))
+        player = {'id': i + 1, 'name': f"Player {i + 1}", 'position': position,
+                  'price': price, 'points': points}
+        player['rating'] = calculate_player_rating(player)
+        players.append(player)
+    # Guarantee the formation can be filled
+    for position, count in FORMATION_442.items():
+        while sum(1 for p in players if p['position'] == position) < count:
+            players[rng.randrange(len(players))]['position'] = position
+    return players
+
+
+def legacy_suggest_team(all_players, budget=100.0, timeout=None):
+    """The original suggest_team search, with an optional time limit"""
+    deadline = time.perf_counter() + timeout if timeout else None
+    goalkeepers = sorted([p for p in all_players if p['position'] == 'GK'], key=lambda x: x['rating'], reverse=True)
+    defenders = sorted([p for p in all_players if p['position'] == 'DEF'], key=lambda x: x['rating'], reverse=True)
+    midfielders = sorted([p for p in all_players if p['position'] == 'MID'], key=lambda x: x['rating'], reverse=True)
+    forwards = sorted([p for p in all_players if p['position'] == 'FWD'], key=lambda x: x['rating'], reverse=True)
+
+    def try_combination(gk, defs, mids, fwds):
+        total_cost = (gk['price'] + sum(p['price'] for p in defs) +
+                      sum(p['price'] for p in mids) + sum(p['price'] for p in fwds))
+        return total_cost <= budget
+
+    suggested = (goalkeepers[0], defenders[:4], midfielders[:4], forwards[:2])
+    if not try_combination(*suggested):
+        for gk in goalkeepers:
+            for i in range(len(defenders) - 3):
+                if deadline and time.perf_counter() > deadline:
+                    return None
+                for j in range(len(midfielders) - 3):
+                    for k in range(len(forwards) - 1):
+                        current = (gk, defenders[i:i + 4], midfielders[j:j + 4], forwards[k:k + 2])
+                        if try_combination(*current):
+                            suggested = current
+                            break
+    gk, defs, mids, fwds = suggested
+    return {'GK': [gk], 'DEF': defs, 'MID': mids, 'FWD': fwds}
+
+
+def squad_summary(squad):
+    members = [p for position in FORMATION_442 for p in squad[position]]
+    return sum(p['rating'] for p in members), sum(p['price'] for p in members)
+
+
+def run(sizes, budget, legacy_timeout, repeat):
+    print(f"{'players':>8} {'optimizer ms':>13} {'opt rating':>11} {'opt cost':>9} "
+          f"{'legacy ms':>10} {'legacy rating':>14} {'legacy cost':>12}")
+    results = []
+    for size in sizes:
+        roster = synthetic_roster(size, seed=size)
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            squad = optimize_team(roster, budget=budget)
+            timings.append((time.perf_counter() - start) * 1000)
+        opt_rating, opt_cost = squad_summary(squad)
+
+        start = time.perf_counter()
+        legacy = legacy_suggest_team(roster, budget, timeout=legacy_timeout)
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        if legacy is None:
+            legacy_cols = f"{'> %ds' % legacy_timeout:>10} {'timed out':>14} {'-':>12}"
+            legacy_rating = legacy_cost = None
+        else:
+            legacy_rating, legacy_cost = squad_summary(legacy)
+            legacy_cols = f"{legacy_ms:>10.1f} {legacy_rating:>14.1f} {legacy_cost:>12.1f}"
+
+        print(f"{size:>8} {min(timings):>13.2f} {opt_rating:>11.1f} {opt_cost:>9.1f} {legacy_cols}")
+        results.append({
+            'players': size,
+            'optimizer_ms': min(timings),
+            'optimizer_rating': opt_rating,
+            'optimizer_cost': opt_cost,
+            'legacy_ms': None if legacy is None else legacy_ms,
+            'legacy_rating': legacy_rating,
+            'legacy_cost': legacy_cost,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[60, 120, 250, 500, 1000])
+    parser.add_argument("--budget", type=float, default=100.0)
+    parser.add_argument("--legacy-timeout", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.budget, args.legacy_timeout, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Benchmark suite for the app's hot paths at several league sizes.
+
+    python benchmarks/bench_suite.py --scales 1000 10000 100000 --output bench_results.json
+    python benchmarks/bench_suite.py --compare bench_results.json   # fail on regressions
+
+Every scale gets its own database (<db-prefix>_<scale>, created if missing) and
+is seeded once with seed_league.py, so later runs reuse it. Each scale runs in
+a child process with DB_NAME pointing at its database. Cases:
+
+- update_user_points (full league, after resetting all credited points)
+- update_user_points (one match: both clubs' players gain a point first)
+- suggest_team
+- get_popular_players
+- get_user_squad_history (the user with the deepest history)
+- dashboard (every read of show_dashboard through load_dashboard_snapshot)
+- recompute_season (players and squad totals rebuilt from player_match_stats)
+- reconcile (report-only checksum pass over players, squad slots, squads and users)
+
+Each scale also runs the query-plan check (check_query_plans.py) against its
+seeded database; statements that picked up a full table scan are listed in the
+results and make the exit status 1, as does any case whose median got more
+than --threshold percent slower than in the --compare results.
+
+Results are written as JSON (with the git commit) so runs can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _time_case(run, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'runs': repeat,
+        'min_ms': round(min(timings), 2),
+        'median_ms': round(statistics.median(timings), 2),
+        'max_ms': round(max(timings), 2),
+    }
+
+
+def run_scale(scale, repeat, seed):
+    """Seed (if needed) and time every case against the current DB_NAME"""
+    import app
+    from config import get_database_connection
+    from dashboard_data import load_dashboard_snapshot
+    from migrations import ensure_schema
+    from pymysql.cursors import DictCursor
+    from scoring import update_user_points
+    from season_recompute import recompute_season
+    from reconcile import reconcile
+    from bench_parallel_scoring import reset_credited_points
+    from check_query_plans import check as check_query_plans
+    from seed_league import seed_league
+
+    ensure_schema()
+    conn = get_database_connection()
+    cursor = conn.cursor(DictCursor)
+    try:
+        cursor.execute("SELECT COUNT(*) AS squads FROM squad_history")
+        if not cursor.fetchone()['squads']:
+            seed_league(users=scale, seed=seed, verbose=False)
+
+        cursor.execute("""
+            SELECT id, username, points, is_admin
+            FROM users
+            WHERE id = (
+                SELECT user_id FROM squad_history
+                GROUP BY user_id
+                ORDER BY COUNT(*) DESC, user_id
+                LIMIT 1
+            )
+        """)
+        user = cursor.fetchone()
+        cursor.execute("""
+            SELECT home_team, away_team FROM matches
+            ORDER BY status = 'completed' DESC, match_time DESC
+            LIMIT 1
+        """)
+        match = cursor.fetchone()
+        cursor.execute(
+            "SELECT id FROM players WHERE team IN (%s, %s)",
+            (match['home_team'], match['away_team'])
+        )
+        match_player_ids = [row['id'] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+    def score_match_setup():
+        conn = get_database_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE players SET points = points + 1 WHERE id IN %s", (tuple(match_player_ids),))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    cases = [
+        ('update_user_points[full]', lambda: update_user_points(), reset_credited_points),
+        ('update_user_points[match]', lambda: update_user_points(player_ids=match_player_ids), score_match_setup),
+        ('suggest_team', app.suggest_team, None),
+        ('get_popular_players', app.get_popular_players, None),
+        ('get_user_squad_history', lambda: app.get_user_squad_history(user['id']), None),
+        ('dashboard', lambda: load_dashboard_snapshot(app.dashboard_queries(user)), None),
+        ('recompute_season', recompute_season, None),
+        ('reconcile', reconcile, None),
+    ]
+    _, plan_failures, plan_errors = check_query_plans()
+    plan_regressions = [
+        {'scale': scale, 'statement': label, 'full_scans': [table for table, _ in scans]}
+        for label, scans in plan_failures
+    ] + [{'scale': scale, 'statement': label, 'error': message} for label, message in plan_errors]
+    for regression in plan_regressions:
+        print(f"{scale:>8} PLAN REGRESSION {regression['statement']}: "
+              f"{regression.get('error') or ', '.join(regression['full_scans'])}")
+
+    results = []
+    for name, run, setup in cases:
+        timing = _time_case(run, repeat, setup)
+        results.append({'scale': scale, 'case': name, **timing})
+        print(f"{scale:>8} {name:<28} {timing['min_ms']:>10.1f} {timing['median_ms']:>10.1f} {timing['max_ms']:>10.1f}")
+    return {'results': results, 'plan_regressions': plan_regressions}
+
+
+def _create_database(name):
+    import pymysql
+    conn = pymysql.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASS", "root"),
+        ssl={'ssl': {}}
+    )
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{name}`")
+    finally:
+        conn.close()
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales, repeat, db_prefix, seed=0):
+    print(f"{'scale':>8} {'case':<28} {'min ms':>10} {'median ms':>10} {'max ms':>10}")
+    results = []
+    plan_regressions = []
+    for scale in scales:
+        database = f"{db_prefix}_{scale}"
+        _create_database(database)
+        # A fresh process per scale: the connection pool and caches are per process
+        with tempfile.TemporaryDirectory() as tmp:
+            scale_output = os.path.join(tmp, "results.json")
+            subprocess.check_call(
+                [sys.executable, os.path.abspath(__file__), "--run-scale", str(scale),
+                 "--repeat", str(repeat), "--seed", str(seed), "--output", scale_output],
+                env={**os.environ, 'DB_NAME': database},
+            )
+            with open(scale_output) as f:
+                scale_results = json.load(f)
+            results.extend(scale_results['results'])
+            plan_regressions.extend(scale_results['plan_regressions'])
+    return {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'repeat': repeat,
+        'results': results,
+        'plan_regressions': plan_regressions,
+    }
+
+
+def compare(previous, current, threshold):
+    """Cases whose median slowed down by more than `threshold` percent"""
+    before = {(r['scale'], r['case']): r for r in previous['results']}
+    regressions = []
+    for result in current['results']:
+        old = before.get((result['scale'], result['case']))
+        if old is None or not old['median_ms']:
+            continue
+        change = (result['median_ms'] - old['median_ms']) / old['median_ms'] * 100
+        if change > threshold:
+            regressions.append({**result, 'previous_median_ms': old['median_ms'], 'change_pct': round(change, 1)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000, 50000], help="league sizes (users)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db-prefix", default="fantasy_bench")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="previous results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed median slowdown in percent")
+    parser.add_argument("--run-scale", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scale:
+        # Child process for one scale
+        with open(args.output, "w") as f:
+            json.dump(run_scale(args.run_scale, args.repeat, args.seed), f)
+        return
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    current = run(args.scales, args.repeat, args.db_prefix, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    failed = bool(current['plan_regressions'])
+    if previous is not None:
+        regressions = compare(previous, current, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['scale']:>8} {r['case']:<28} {r['previous_median_ms']:>10.1f} -> "
+                  f"{r['median_ms']:.1f} ms (+{r['change_pct']}%)")
+        failed = failed or bool(regressions)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
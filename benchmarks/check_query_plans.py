@@ -0,0 +1,230 @@
+"""
+Query-plan regression check.
+
+Collects every SQL statement the app sends (string literals passed to
+cursor.execute / executemany and module-level SQL constants in the top-level
+modules), fills in representative parameter values, runs EXPLAIN against a
+seeded database and fails if any statement does a full table scan on a table
+that is not tiny, or if a statement listed in RANGE_SCANS does not read its
+table with an index range scan (EXPLAIN type=range) on the expected index.
+
+    DB_NAME=fantasy_bench python benchmarks/check_query_plans.py
+
+The database is seeded with benchmarks/seed_league.py first if it has no
+squads. Statements that scan whole tables on purpose (full-league jobs,
+snapshots) are listed in ALLOWED_FULL_SCANS with the reason.
+"""
+import argparse
+import ast
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import get_database_connection  # noqa: E402
+from migrations import ensure_schema  # noqa: E402
+
+# Modules whose SQL is checked (migrations only touch information_schema / DDL)
+SKIP_MODULES = {"migrations.py", "config.py", "db_pool.py"}
+
+# (module, function) -> why a full scan is expected
+ALLOWED_FULL_SCANS = {
+    ("player_catalog.py", "_load"): "loads the whole players table once per process",
+    ("app.py", "get_all_players_with_stats"): "suggest_team rates every player",
+    ("scoring.py", "update_user_points_loop"): "reference implementation, scores every user",
+    ("scoring.py", "_LATEST_SQUAD_DELTAS"): "full-league scoring run",
+    ("selection_stats.py", "rebuild_stats"): "admin reconciliation rebuild",
+    ("season_recompute.py", "rebuild_squad_totals"): "season rebuild of every current squad",
+    ("reconcile.py", "credit_gap"): "nightly reconciliation over every current squad",
+}
+
+# (module, function or constant) -> (table, index) it must read with a range scan
+RANGE_SCANS = {
+    ("leaderboard.py", "_NEXT_PAGE_SQL"): ("users", "idx_users_points"),
+}
+
+# Tables with fewer rows than this may be scanned (the optimizer prefers it)
+MIN_SCAN_ROWS = 100
+
+# Temporary tables some statements expect to exist on the session
+SESSION_SETUP = [
+    "DROP TEMPORARY TABLE IF EXISTS score_delta",
+    "CREATE TEMPORARY TABLE score_delta (squad_id INT PRIMARY KEY, user_id INT NOT NULL, delta INT NOT NULL)",
+]
+
+EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|INSERT\s+INTO\s+\w+\s*(\([^)]*\))?\s*SELECT)\b", re.I | re.S)
+
+
+def _sql_text(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    return None
+
+
+def collect_statements(root=ROOT):
+    """[(module, function or constant name, line, sql)] for every literal SQL statement"""
+    found = []
+    for filename in sorted(os.listdir(root)):
+        if not filename.endswith(".py") or filename in SKIP_MODULES:
+            continue
+        with open(os.path.join(root, filename), encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename)
+
+        # Module-level SQL constants
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                sql = _sql_text(node.value)
+                if sql and EXPLAINABLE.match(sql):
+                    found.append((filename, node.targets[0].id, node.lineno, sql))
+
+        # cursor.execute("...") / cursor.executemany("...") inside functions
+        for func in ast.walk(tree):
+            if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            for node in _own_nodes(func):
+                if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                        and node.func.attr in ("execute", "executemany") and node.args):
+                    sql = _sql_text(node.args[0])
+                    if sql and EXPLAINABLE.match(sql):
+                        found.append((filename, func.name, node.lineno, sql))
+
+    return sorted(found, key=lambda s: (s[0], s[2]))
+
+
+def _own_nodes(func):
+    """Nodes of a function body, not descending into nested functions"""
+    stack = list(func.body)
+    while stack:
+        node = stack.pop()
+        yield node
+        for child in ast.iter_child_nodes(node):
+            if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+                stack.append(child)
+
+
+def _sample_value(sql_before):
+    """Representative literal for a placeholder, based on the column it is compared with"""
+    if re.search(r"LIMIT\s*$", sql_before, re.I):
+        return "10"
+    if re.search(r"IN\s*$", sql_before, re.I):
+        return "(1, 2, 3)"
+    match = re.search(r"(\w+)\s*(?:=|<=|>=|<|>|!=)\s*(?:\w+\s*[+-]\s*)?$", sql_before)
+    column = match.group(1).lower() if match else ""
+    if any(word in column for word in ("time", "date", "until", "created")):
+        return "'2024-01-01 00:00:00'"
+    if column in ("position",):
+        return "'MID'"
+    if column in ("username", "name", "team", "password", "title", "status", "youtube_url"):
+        return "'sample'"
+    return "1"
+
+
+def fill_placeholders(sql):
+    """Replace %s / %(name)s placeholders with sample literals"""
+    out = []
+    pos = 0
+    for match in re.finditer(r"%(\(\w+\))?s", sql):
+        out.append(sql[pos:match.start()])
+        out.append(_sample_value("".join(out)))
+        pos = match.end()
+    out.append(sql[pos:])
+    return "".join(out)
+
+
+def explain(cursor, sql):
+    """EXPLAIN rows as dicts with lower-case keys"""
+    cursor.execute("EXPLAIN " + sql)
+    columns = [d[0].lower() for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def full_scans(plans):
+    """Tables (with estimated rows) read by a full scan in the plan"""
+    scans = []
+    for plan in plans:
+        table = plan.get("table") or ""
+        if plan.get("type") == "ALL" and not table.startswith("<") and table != "score_delta":
+            rows = plan.get("rows") or 0
+            if rows >= MIN_SCAN_ROWS:
+                scans.append((table, rows))
+    return scans
+
+
+def missing_range_scan(plans, table, index):
+    """[(description, rows)] if `table` is not read with a range scan on `index`"""
+    for plan in plans:
+        if plan.get("table") == table:
+            if plan.get("type") == "range" and plan.get("key") == index:
+                return []
+            return [(f"{table} type={plan.get('type')} key={plan.get('key')}, expected range on {index}",
+                     plan.get("rows") or 0)]
+    return [(f"{table} not in plan, expected range on {index}", 0)]
+
+
+def check(verbose=False):
+    statements = collect_statements()
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    failures = []
+    errors = []
+    try:
+        for statement in SESSION_SETUP:
+            cursor.execute(statement)
+        for module, name, line, sql in statements:
+            label = f"{module}:{line} {name}"
+            try:
+                plans = explain(cursor, fill_placeholders(sql))
+            except Exception as e:
+                errors.append((label, str(e)))
+                continue
+            scans = full_scans(plans)
+            if (module, name) in RANGE_SCANS:
+                scans += missing_range_scan(plans, *RANGE_SCANS[(module, name)])
+            allowed = ALLOWED_FULL_SCANS.get((module, name))
+            if scans and not allowed:
+                failures.append((label, scans))
+            if verbose:
+                status = "BAD PLAN" if scans else "ok"
+                if scans and allowed:
+                    status = f"allowed ({allowed})"
+                print(f"{status:<12} {label}")
+    finally:
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS score_delta")
+        cursor.close()
+        conn.close()
+    return statements, failures, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    parser.add_argument("--no-seed", action="store_true", help="don't seed an empty database")
+    args = parser.parse_args()
+
+    ensure_schema()
+    if not args.no_seed:
+        from seed_league import seed_league
+        conn = get_database_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM squad_history")
+        empty = cursor.fetchone()[0] == 0
+        cursor.close()
+        conn.close()
+        if empty:
+            seed_league(users=2000, verbose=args.verbose)
+
+    statements, failures, errors = check(verbose=args.verbose)
+    print(f"Checked {len(statements)} statements: {len(failures)} plan regressions, "
+          f"{len(errors)} could not be explained")
+    for label, scans in failures:
+        tables = ", ".join(f"{table} (~{rows} rows)" for table, rows in scans)
+        print(f"  BAD PLAN   {label}: {tables}")
+    for label, message in errors:
+        print(f"  ERROR      {label}: {message}")
+    sys.exit(1 if failures or errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Equivalence check for the scoring modes.
+
+Runs the "loop" reference and the "set" and "parallel" modes (scoring.py) on
+the same seeded league and compares every squad_players.points_earned,
+squad_history.total_points and users.points they leave behind. Each mode
+starts from the same state (all credited points reset to 0) and does:
+
+- a full-league run, then
+- a match-scoped run (player_ids) after some players gained points.
+
+    DB_NAME=fantasy_bench python benchmarks/check_scoring_modes.py
+    DB_NAME=fantasy_bench python benchmarks/check_scoring_modes.py --modes loop set
+
+Seeds a --users league with seed_league.py if the database has no squads yet.
+Resets credited points, so it refuses to run against a database with users
+that seed_league.py did not create, unless --force is given. Exits with status
+1 on any difference.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import get_database_connection  # noqa: E402
+from scoring import update_user_points  # noqa: E402
+from bench_parallel_scoring import prepare, reset_credited_points  # noqa: E402
+from check_season_recompute import credited_points  # noqa: E402
+
+REFERENCE_MODE = "loop"
+
+
+def _adjust_points(player_ids, change):
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("UPDATE players SET points = points + %s WHERE id IN %s", (change, player_ids))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _credited():
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        return credited_points(cursor)
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+
+
+def run_mode(mode, gained, gain):
+    """{'full': credited, 'match': credited, 'ms': {...}} for one mode"""
+    reset_credited_points()
+    started = time.perf_counter()
+    if not update_user_points(mode=mode):
+        raise SystemExit(f"{mode}: full run failed")
+    full_ms = (time.perf_counter() - started) * 1000
+    full = _credited()
+
+    _adjust_points(gained, gain)
+    try:
+        started = time.perf_counter()
+        if not update_user_points(mode=mode, player_ids=gained):
+            raise SystemExit(f"{mode}: match-scoped run failed")
+        match_ms = (time.perf_counter() - started) * 1000
+        match = _credited()
+    finally:
+        _adjust_points(gained, -gain)
+    return {'full': full, 'match': match, 'ms': {'full': full_ms, 'match': match_ms}}
+
+
+def differences(reference, other):
+    return [
+        f"{table} {key}: {REFERENCE_MODE} {value}, got {other.get((table, key))}"
+        for (table, key), value in reference.items()
+        if other.get((table, key)) != value
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["set", "parallel"], help="modes to compare with loop")
+    parser.add_argument("--users", type=int, default=2000, help="league size to seed if the database is empty")
+    parser.add_argument("--share", type=float, default=0.05, help="share of players that gain points")
+    parser.add_argument("--gain", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--force", action="store_true", help="run even if the database has real users")
+    args = parser.parse_args()
+
+    prepare(args.users, args.force)
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id FROM players")
+        ids = [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+    rng = np.random.default_rng(args.seed)
+    gained = tuple(int(i) for i in rng.choice(ids, max(1, int(len(ids) * args.share)), replace=False))
+
+    reference = run_mode(REFERENCE_MODE, gained, args.gain)
+    print(f"{REFERENCE_MODE:<10} full {reference['ms']['full']:>9.1f} ms  match {reference['ms']['match']:>9.1f} ms  "
+          f"({len(reference['full'])} credited values)")
+    failed = False
+    for mode in args.modes:
+        result = run_mode(mode, gained, args.gain)
+        problems = differences(reference['full'], result['full']) + differences(reference['match'], result['match'])
+        print(f"{mode:<10} full {result['ms']['full']:>9.1f} ms  match {result['ms']['match']:>9.1f} ms  "
+              f"{len(problems)} differences")
+        for problem in problems[:20]:
+            print(f"  {problem}")
+        failed = failed or bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Equivalence check for the vectorized season recompute.
+
+Compares season_recompute.compute_season() with a row-by-row reference: every
+player_match_stats row scored on its own from the rules' per-position values,
+summed per player on top of baseline_points. Against a database it also
+compares with what the per-match path stored (player_match_stats.points and
+players.points, as written by match_results.apply_match_result).
+
+--rebuild checks that a full rebuild agrees with incremental scoring: the
+league is scored from scratch with some players' points temporarily raised,
+scored again once they drop back (as after cards or a re-submitted match), and
+recompute_season() must then leave every points_earned, total_points and
+users.points as scoring left them. It rewrites credited points, so point it
+at a scratch database.
+
+    DB_NAME=fantasy_bench python benchmarks/check_season_recompute.py
+    DB_NAME=fantasy_bench python benchmarks/check_season_recompute.py --rebuild
+    python benchmarks/check_season_recompute.py --synthetic 200000   # no database needed
+
+Exits with status 1 on any difference.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scoring_rules import POSITIONS, STAT_COLUMNS, get_rules  # noqa: E402
+from season_recompute import compute_season  # noqa: E402
+
+
+def synthetic_season(stat_rows, players=400, seed=0):
+    """Random players / player_match_stats frames shaped like the tables"""
+    rng = np.random.default_rng(seed)
+    player_frame = pd.DataFrame({
+        'id': np.arange(1, players + 1),
+        'position': rng.choice(POSITIONS, players),
+        'baseline_points': rng.integers(0, 20, players),
+        'points': 0,
+    })
+    # (match_id, player_id) is the table's primary key: 30 distinct players a match
+    matches = -(-stat_rows // 30)
+    player_ids = np.concatenate([rng.choice(players, 30, replace=False) + 1 for _ in range(matches)])[:stat_rows]
+    stats = pd.DataFrame({
+        'match_id': np.arange(stat_rows) // 30 + 1,
+        'player_id': player_ids,
+        'goals': rng.poisson(0.15, stat_rows),
+        'assists': rng.poisson(0.1, stat_rows),
+        'yellows': rng.binomial(1, 0.1, stat_rows),
+        'reds': rng.binomial(1, 0.01, stat_rows),
+        'clean_sheet': rng.binomial(1, 0.3, stat_rows),
+        'appeared': rng.binomial(1, 0.8, stat_rows),
+        'points': 0,
+    })
+    return player_frame, stats
+
+
+def load_season():
+    from config import get_database_connection
+    from season_recompute import _load_season
+
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        return _load_season(cursor, lock_rows=False)
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+
+
+def credited_points(cursor):
+    """{(table, key): value} for every credited total scoring maintains"""
+    credited = {}
+    cursor.execute("SELECT squad_id, player_id, COALESCE(points_earned, 0) FROM squad_players")
+    credited.update(
+        (('squad_players', (squad_id, player_id)), points) for squad_id, player_id, points in cursor.fetchall()
+    )
+    cursor.execute("SELECT id, total_points FROM squad_history")
+    credited.update((('squad_history', squad_id), points) for squad_id, points in cursor.fetchall())
+    cursor.execute("SELECT id, points FROM users")
+    credited.update((('users', user_id), points) for user_id, points in cursor.fetchall())
+    return credited
+
+
+def check_rebuild(seed=0, share=0.1, drop=5):
+    """Score the league incrementally, rebuild it, and list every credited value that moved"""
+    from config import get_database_connection
+    from bench_parallel_scoring import reset_credited_points
+    from scoring import update_user_points
+    from season_recompute import recompute_season
+
+    # Players' points must already match their stats, or the rebuild rightly changes them
+    recompute_season()
+    reset_credited_points()
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id FROM players")
+        ids = [row[0] for row in cursor.fetchall()]
+        rng = np.random.default_rng(seed)
+        dropped = tuple(int(player_id) for player_id in rng.choice(ids, max(1, int(len(ids) * share)), replace=False))
+        cursor.execute("UPDATE players SET points = points + %s WHERE id IN %s", (drop, dropped))
+        conn.commit()
+        update_user_points()
+        cursor.execute("UPDATE players SET points = points - %s WHERE id IN %s", (drop, dropped))
+        conn.commit()
+        update_user_points()
+
+        before = credited_points(cursor)
+        conn.commit()
+        started = time.perf_counter()
+        recompute_season()
+        rebuild_ms = (time.perf_counter() - started) * 1000
+        after = credited_points(cursor)
+    finally:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+
+    problems = [
+        f"{table} {key}: scored {before[(table, key)]}, rebuilt {after.get((table, key))}"
+        for table, key in before
+        if after.get((table, key)) != before[(table, key)]
+    ]
+    print(f"{len(before)} credited values, {len(dropped)} players dropped {drop} points: "
+          f"rebuild {rebuild_ms:.1f} ms, {len(problems)} differences")
+    for problem in problems[:20]:
+        print(f"  {problem}")
+    return problems
+
+
+def reference_season(players, stats, rules):
+    """Row-by-row scoring: ({(match_id, player_id): points}, {player_id: season points})"""
+    positions = dict(zip(players['id'], players['position']))
+    row_points = {}
+    for row in stats.itertuples(index=False):
+        position = positions[row.player_id]
+        row_points[(row.match_id, row.player_id)] = sum(
+            getattr(row, column) * rules.points(position, column) for column in STAT_COLUMNS
+        )
+    season = {player_id: baseline for player_id, baseline in zip(players['id'], players['baseline_points'])}
+    for (_, player_id), points in row_points.items():
+        season[player_id] += points
+    return row_points, season
+
+
+def compare(players, stats, stored):
+    rules = get_rules()
+    started = time.perf_counter()
+    new_players, new_stats = compute_season(players, stats)
+    vectorized_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    row_points, season = reference_season(players, stats, rules)
+    reference_ms = (time.perf_counter() - started) * 1000
+
+    problems = []
+    for row in new_stats.itertuples(index=False):
+        key = (row.match_id, row.player_id)
+        if row.new_points != row_points[key]:
+            problems.append(f"match {key[0]} player {key[1]}: vectorized {row.new_points}, reference {row_points[key]}")
+        if stored and row.new_points != row.points:
+            problems.append(f"match {key[0]} player {key[1]}: vectorized {row.new_points}, stored {row.points}")
+    for row in new_players.itertuples(index=False):
+        if row.new_points != season[row.id]:
+            problems.append(f"player {row.id}: vectorized {row.new_points}, reference {season[row.id]}")
+        if stored and row.new_points != row.points:
+            problems.append(f"player {row.id}: vectorized {row.new_points}, stored {row.points}")
+
+    print(f"{len(stats)} stat rows, {len(players)} players: vectorized {vectorized_ms:.1f} ms, "
+          f"row by row {reference_ms:.1f} ms, {len(problems)} differences")
+    for problem in problems[:20]:
+        print(f"  {problem}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, metavar="ROWS", help="check random data instead of the database")
+    parser.add_argument("--rebuild", action="store_true", help="check a rebuild against incremental scoring")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.rebuild:
+        problems = check_rebuild(seed=args.seed)
+    elif args.synthetic:
+        players, stats = synthetic_season(args.synthetic, seed=args.seed)
+        problems = compare(players, stats, stored=False)
+    else:
+        players, stats = load_season()
+        problems = compare(players, stats, stored=True)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
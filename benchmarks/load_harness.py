@@ -0,0 +1,378 @@
+"""
+Concurrent-session load harness for the Streamlit app.
+
+    DB_NAME=fantasy_bench python benchmarks/load_harness.py --sessions 50 --iterations 3
+
+Every simulated session is a separate process driving app.py through
+Streamlit's headless AppTest runner. The processes are needed because AppTest
+keeps process-global runtime state and cannot run several apps in one process.
+Each session logs in as a seeded bench user, then runs `--iterations` rounds
+of the following steps:
+
+- view the dashboard
+- open Create Team
+- change a few player selections
+- take the suggested team
+- save it
+
+One admin session logs in alongside them. After `--admin-after` seconds it
+submits a match result, and the scoring worker (started by the harness
+unless --no-worker) processes the job while the other sessions keep going.
+
+Per-rerun wall time and DB queries come from the app's own instrumentation
+(query_stats rerun listener), so they cover exactly what main() did. The
+report gives p50/p95/p99 rerun latency and queries per rerun for each page,
+plus latency per user-visible step.
+
+Bench users' squad locks are cleared before the run so every session can
+save. The harness refuses to run against a database with users that
+seed_league.py did not create, unless --force is given.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+APP_PATH = os.path.join(ROOT, "app.py")
+BENCH_PASSWORD = "password"  # seed_league.py's password for every bench user
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+# --- Session side (child process) ------------------------------------------
+
+class Session:
+    """One simulated browser session: an AppTest plus the timings it collected"""
+
+    def __init__(self, timeout):
+        from streamlit.testing.v1 import AppTest
+        import query_stats
+
+        self.app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.reruns = []
+        self.steps = []
+        query_stats.add_rerun_listener(self._on_rerun)
+
+    def close(self):
+        """Stop collecting reruns"""
+        import query_stats
+
+        query_stats.remove_rerun_listener(self._on_rerun)
+
+    def _on_rerun(self, rerun):
+        self.reruns.append({
+            'page': rerun.page,
+            'wall_ms': round(rerun.wall_ms, 2),
+            'queries': rerun.queries,
+            'db_ms': round(rerun.db_ms, 2),
+        })
+
+    def step(self, name, action):
+        """Run one interaction (action returns the AppTest run) and time it"""
+        start = time.perf_counter()
+        error = None
+        try:
+            action().run()
+            if self.app.exception:
+                error = self.app.exception[0].message
+        except Exception as e:
+            error = str(e)
+        self.steps.append({
+            'step': name,
+            'ms': round((time.perf_counter() - start) * 1000, 2),
+            'error': error,
+        })
+        return error is None
+
+    def widget(self, kind, label):
+        return next(w for w in getattr(self.app, kind) if w.label == label)
+
+    def login(self, username, password):
+        self.step("open", lambda: self.app)
+        self.widget("text_input", "Username").input(username)
+        self.widget("text_input", "Password").input(password)
+        return self.step("login", lambda: self.widget("button", "Login").click())
+
+    @property
+    def page(self):
+        return self.app.session_state.page
+
+
+def run_user_session(username, password, iterations, timeout):
+    session = Session(timeout)
+    if not session.login(username, password):
+        return session
+
+    for round_number in range(iterations):
+        session.step("dashboard", lambda: session.app)
+        if not session.step("open_create_team", lambda: session.app.button(key="nav_create").click()):
+            continue
+        if "Save Team" not in [b.label for b in session.app.button]:
+            # Squad still locked; go back like a real user would
+            session.step("back_to_dashboard", lambda: session.widget("button", "Back to Dashboard").click())
+            continue
+
+        session.step("select_player", lambda: session.widget("selectbox", "GK").set_value(1 + round_number))
+        session.step("select_player", lambda: session.app.selectbox(key="DEF_0").set_value(1 + round_number))
+        session.step("suggest_team", lambda: session.app.button(key="nav_ai_suggest").click())
+        session.step("save_team", lambda: session.widget("button", "Save Team").click())
+        if session.page == "create_team":
+            session.step("back_to_dashboard", lambda: session.app.button(key="nav_dashboard").click())
+    return session
+
+
+def run_admin_session(password, match_date, delay, timeout):
+    from datetime import date
+    from job_queue import get_job
+
+    session = Session(timeout)
+    if not session.login("admin", password):
+        return session, None
+
+    started = time.monotonic()
+    while time.monotonic() - started < delay:
+        session.step("dashboard", lambda: session.app)
+        time.sleep(1)
+
+    if not session.step("open_admin", lambda: session.app.button(key="nav_admin").click()):
+        return session, None
+    session.step("select_match_date", lambda: session.widget("date_input", "Select Match Date")
+                 .set_value(date.fromisoformat(match_date)))
+    if not session.step("submit_match_result", lambda: session.widget("button", "Submit Match Result").click()):
+        return session, None
+
+    # The status fragment polls in a browser; here the job is polled directly
+    job_id = session.app.session_state.scoring_job_id
+    submitted = time.monotonic()
+    job = get_job(job_id)
+    while job['status'] in ('queued', 'running') and time.monotonic() - submitted < 600:
+        time.sleep(0.5)
+        job = get_job(job_id)
+    scoring = {
+        'job_id': job_id,
+        'status': job['status'],
+        'seconds': round(time.monotonic() - submitted, 2),
+        'message': job['message'] or job['error'],
+    }
+    return session, scoring
+
+
+def session_main(args):
+    """Child process entry point; writes the session's samples to --output"""
+    os.chdir(ROOT)  # The app loads images and logos by relative path
+    time.sleep(args.start_delay)
+    scoring = None
+    if args.admin:
+        session, scoring = run_admin_session(args.password, args.match_date, args.admin_after, args.timeout)
+    else:
+        session = run_user_session(args.user, args.password, args.iterations, args.timeout)
+    session.close()
+    with open(args.output, "w") as f:
+        json.dump({'reruns': session.reruns, 'steps': session.steps, 'scoring': scoring}, f)
+
+
+# --- Driver side -------------------------------------------------------------
+
+def prepare(sessions, users, force):
+    """Seed if needed, clear bench squad locks; returns (usernames, match date)"""
+    from config import get_database_connection
+    from migrations import ensure_schema
+    from seed_league import seed_league
+
+    ensure_schema()
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT COUNT(*) FROM users
+            WHERE username NOT LIKE 'bench\\_user\\_%' AND username <> 'admin'
+        """)
+        if cursor.fetchone()[0] and not force:
+            raise SystemExit("Database has real users; refusing to unlock their squads (use --force)")
+
+        cursor.execute("SELECT COUNT(*) FROM squad_history")
+        if not cursor.fetchone()[0]:
+            seed_league(users=max(users, sessions), verbose=False)
+
+        cursor.execute("UPDATE users SET locked_until = NULL WHERE username LIKE 'bench\\_user\\_%'")
+        cursor.execute("""
+            SELECT username FROM users
+            WHERE username LIKE 'bench\\_user\\_%'
+            ORDER BY id
+            LIMIT %s
+        """, (sessions,))
+        usernames = [row[0] for row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT DATE(match_time) FROM matches
+            WHERE match_time <= NOW()
+            ORDER BY match_time DESC
+            LIMIT 1
+        """)
+        match = cursor.fetchone()
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    if len(usernames) < sessions:
+        raise SystemExit(f"Only {len(usernames)} bench users available for {sessions} sessions")
+    return usernames, match[0].isoformat() if match else None
+
+
+def summarize(samples):
+    pages = {}
+    for rerun in (r for s in samples for r in s['reruns']):
+        pages.setdefault(rerun['page'], []).append(rerun)
+    steps = {}
+    for step in (st for s in samples for st in s['steps']):
+        steps.setdefault(step['step'], []).append(step)
+
+    page_rows = []
+    for page, reruns in sorted(pages.items()):
+        wall = [r['wall_ms'] for r in reruns]
+        queries = [r['queries'] for r in reruns]
+        page_rows.append({
+            'page': page,
+            'reruns': len(reruns),
+            'p50_ms': percentile(wall, 50),
+            'p95_ms': percentile(wall, 95),
+            'p99_ms': percentile(wall, 99),
+            'queries_mean': round(statistics.mean(queries), 1),
+            'queries_p95': percentile(queries, 95),
+            'db_ms_mean': round(statistics.mean(r['db_ms'] for r in reruns), 1),
+        })
+    step_rows = []
+    for name, entries in sorted(steps.items()):
+        ms = [e['ms'] for e in entries]
+        step_rows.append({
+            'step': name,
+            'count': len(entries),
+            'errors': sum(1 for e in entries if e['error']),
+            'p50_ms': percentile(ms, 50),
+            'p95_ms': percentile(ms, 95),
+            'p99_ms': percentile(ms, 99),
+        })
+    errors = sorted({e['error'] for s in samples for e in s['steps'] if e['error']})
+    scoring = next((s['scoring'] for s in samples if s['scoring']), None)
+    return {'pages': page_rows, 'steps': step_rows, 'errors': errors, 'scoring': scoring}
+
+
+def print_report(report, elapsed):
+    print(f"\nPer page rerun ({elapsed:.1f}s run)")
+    print(f"{'page':<16} {'reruns':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'q p95':>6} {'db ms':>8}")
+    for row in report['pages']:
+        print(f"{row['page']:<16} {row['reruns']:>7} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} "
+              f"{row['queries_mean']:>8.1f} {row['queries_p95']:>6} {row['db_ms_mean']:>8.1f}")
+
+    print("\nPer step (interaction round trip)")
+    print(f"{'step':<22} {'count':>6} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for row in report['steps']:
+        print(f"{row['step']:<22} {row['count']:>6} {row['errors']:>7} {row['p50_ms']:>9.1f} "
+              f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}")
+
+    if report['scoring']:
+        scoring = report['scoring']
+        print(f"\nScoring job {scoring['job_id']}: {scoring['status']} after {scoring['seconds']}s ({scoring['message']})")
+    for error in report['errors']:
+        print(f"ERROR {error}")
+
+
+def run(sessions, iterations, ramp_up, admin_after, users, admin_password, timeout, start_worker, force):
+    usernames, match_date = prepare(sessions, users, force)
+    if match_date is None:
+        raise SystemExit("No played match to submit a result for")
+
+    worker = None
+    if start_worker:
+        worker = subprocess.Popen([sys.executable, os.path.join(ROOT, "scoring_worker.py")], cwd=ROOT)
+
+    script = os.path.abspath(__file__)
+    common = ["--iterations", str(iterations), "--timeout", str(timeout)]
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        children = []
+        for i, username in enumerate(usernames):
+            output = os.path.join(tmp, f"session_{i}.json")
+            delay = ramp_up * i / max(1, sessions)
+            children.append((output, subprocess.Popen(
+                [sys.executable, script, "--session", "--user", username, "--password", BENCH_PASSWORD,
+                 "--start-delay", f"{delay:.3f}", "--output", output] + common,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )))
+        output = os.path.join(tmp, "session_admin.json")
+        children.append((output, subprocess.Popen(
+            [sys.executable, script, "--session", "--admin", "--password", admin_password,
+             "--match-date", match_date, "--admin-after", str(admin_after), "--output", output] + common,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )))
+
+        samples = []
+        failed = 0
+        for output, child in children:
+            child.wait()
+            if child.returncode == 0 and os.path.exists(output):
+                with open(output) as f:
+                    samples.append(json.load(f))
+            else:
+                failed += 1
+    elapsed = time.perf_counter() - started
+
+    if worker is not None:
+        worker.terminate()
+        worker.wait()
+
+    report = summarize(samples)
+    report.update({'sessions': sessions, 'iterations': iterations, 'failed_sessions': failed,
+                   'seconds': round(elapsed, 1)})
+    print_report(report, elapsed)
+    if failed:
+        print(f"{failed} session process(es) crashed")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent user sessions")
+    parser.add_argument("--iterations", type=int, default=3, help="dashboard / create team rounds per session")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which sessions start")
+    parser.add_argument("--admin-after", type=float, default=10.0, help="seconds before the admin submits a result")
+    parser.add_argument("--users", type=int, default=2000, help="league size to seed if the database is empty")
+    parser.add_argument("--admin-password", default="admin123")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-rerun AppTest timeout")
+    parser.add_argument("--no-worker", action="store_true", help="don't start scoring_worker.py (one is already running)")
+    parser.add_argument("--force", action="store_true", help="run even if the database has real users")
+    parser.add_argument("--output", help="write the report as JSON")
+    # Child process options
+    parser.add_argument("--session", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--admin", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--user", help=argparse.SUPPRESS)
+    parser.add_argument("--password", help=argparse.SUPPRESS)
+    parser.add_argument("--match-date", help=argparse.SUPPRESS)
+    parser.add_argument("--start-delay", type=float, default=0.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.session:
+        session_main(args)
+        return
+
+    report = run(args.sessions, args.iterations, args.ramp_up, args.admin_after, args.users,
+                 args.admin_password, args.timeout, not args.no_worker, args.force)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Synthetic league generator for performance tooling.
+
+Seeds the database configured by the usual DB_* environment variables (run the
+migrations first; the seeder does this itself). Refuses to touch a database
+that already has squads unless --force is given, so point it at a scratch
+database:
+
+    DB_NAME=fantasy_bench python benchmarks/seed_league.py --users 5000
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import get_database_connection  # noqa: E402
+from migrations import ensure_schema  # noqa: E402
+from match_results import collect_player_stats, score_stats, STAT_COLUMNS  # noqa: E402
+from selection_stats import rebuild_stats  # noqa: E402
+
+ISL_CLUBS = [
+    "Mohun Bagan Super Giants", "Bengaluru FC", "Chennaiyin FC", "East Bengal FC",
+    "FC Goa", "Hyderabad FC", "Jamshedpur FC", "Kerala Blasters FC", "Mumbai City FC",
+    "NorthEast United FC", "Odisha FC", "Punjab FC",
+]
+FORMATION = (('GK', 1), ('DEF', 4), ('MID', 4), ('FWD', 2))
+# Share of a club's roster per position
+ROSTER_SHARE = {'GK': 0.12, 'DEF': 0.34, 'MID': 0.34, 'FWD': 0.20}
+BATCH_SIZE = 5000
+# How likely each position is to score, relative to price
+SCORER_WEIGHT = {'GK': 0.02, 'DEF': 0.3, 'MID': 1.0, 'FWD': 2.0}
+
+
+def _insert_many(cursor, sql, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        cursor.executemany(sql, rows[start:start + BATCH_SIZE])
+
+
+def _max_id(cursor, table):
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def seed_league(users=2000, players_per_club=25, squads_per_user=2, seasons=1,
+                highlights=100, seed=0, force=False, verbose=True):
+    """Insert a synthetic league; returns a dict of row counts"""
+    ensure_schema()
+    rng = random.Random(seed)
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    started = time.perf_counter()
+
+    def log(message):
+        if verbose:
+            print(f"[{time.perf_counter() - started:7.1f}s] {message}")
+
+    try:
+        cursor.execute("SELECT COUNT(*) FROM squad_history")
+        if cursor.fetchone()[0] and not force:
+            raise SystemExit("Database already has squads; refusing to seed (use --force)")
+
+        # Players: every club gets a full roster, priced 4.0 - 12.0 Cr. Points
+        # come from the match stats generated below (expensive players score more).
+        player_id = _max_id(cursor, "players")
+        players = []
+        for club in ISL_CLUBS:
+            for position, share in ROSTER_SHARE.items():
+                for _ in range(max(2, round(players_per_club * share))):
+                    player_id += 1
+                    price = rng.choice([x / 2 for x in range(8, 25)])
+                    players.append((player_id, f"Player {player_id}", club, position, price, 0))
+        _insert_many(cursor, """
+            INSERT INTO players (id, name, team, position, price, points)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, players)
+        log(f"{len(players)} players")
+
+        by_position = {position: [p for p in players if p[3] == position] for position, _ in FORMATION}
+        # A few favourites per position are picked far more often than the rest
+        weights = {
+            position: [1.0 / (rank + 1) for rank in range(len(pool))]
+            for position, pool in by_position.items()
+        }
+
+        # Users
+        user_id = _max_id(cursor, "users")
+        password = hashlib.sha256(b"password").hexdigest()
+        user_rows = []
+        for _ in range(users):
+            user_id += 1
+            user_rows.append((user_id, f"bench_user_{user_id}", password))
+        _insert_many(cursor, """
+            INSERT INTO users (id, username, password) VALUES (%s, %s, %s)
+        """, user_rows)
+        log(f"{len(user_rows)} users")
+
+        # Squad history: `squads_per_user` squads each, a day apart
+        squad_id = _max_id(cursor, "squad_history")
+        now = datetime.now()
+        squads = []
+        squad_players = []
+        for uid, _, _ in user_rows:
+            for depth in range(squads_per_user):
+                squad_id += 1
+                created = now - timedelta(days=squads_per_user - depth, minutes=rng.randrange(1440))
+                squads.append((squad_id, uid, created, created + timedelta(days=1)))
+                order = 0
+                for position, count in FORMATION:
+                    picks = set()
+                    while len(picks) < count:
+                        picks.add(rng.choices(range(len(by_position[position])), weights=weights[position])[0])
+                    for pick in sorted(picks):
+                        squad_players.append((squad_id, by_position[position][pick][0], order))
+                        order += 1
+        _insert_many(cursor, """
+            INSERT INTO squad_history (id, user_id, created_at, locked_until)
+            VALUES (%s, %s, %s, %s)
+        """, squads)
+        _insert_many(cursor, """
+            INSERT INTO squad_players (squad_id, player_id, position_order)
+            VALUES (%s, %s, %s)
+        """, squad_players)
+        log(f"{len(squads)} squads, {len(squad_players)} squad players")
+
+        # Matches: double round robin per season, half of them played
+        match_id = _max_id(cursor, "matches")
+        match_rows = []
+        kickoff = now - timedelta(days=60 * seasons)
+        for _ in range(seasons):
+            for home in ISL_CLUBS:
+                for away in ISL_CLUBS:
+                    if home == away:
+                        continue
+                    kickoff += timedelta(hours=rng.choice([6, 18, 24]))
+                    played = kickoff < now
+                    match_id += 1
+                    match_rows.append((
+                        match_id, home, away, kickoff,
+                        'completed' if played else 'upcoming',
+                        rng.randrange(4) if played else None,
+                        rng.randrange(4) if played else None,
+                    ))
+        _insert_many(cursor, """
+            INSERT INTO matches (id, home_team, away_team, match_time, status, home_score, away_score)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, match_rows)
+
+        # Player stats for every played match, through the same rules as the admin form
+        rosters = {}
+        for pid, name, club, position, price, _ in players:
+            rosters.setdefault(club, []).append({'id': pid, 'name': name, 'position': position, 'price': price})
+        stat_rows = []
+        player_points = {}
+        for mid, home, away, _, status, home_score, away_score in match_rows:
+            if status != 'completed':
+                continue
+            scorers, assists = set(), set()
+            for squad, goals in ((rosters[home], home_score), (rosters[away], away_score)):
+                weights = [SCORER_WEIGHT[p['position']] * p['price'] for p in squad]
+                for _ in range(goals):
+                    scorers.add(rng.choices(squad, weights=weights)[0]['name'])
+                    if rng.random() < 0.7:
+                        assists.add(rng.choices(squad, weights=weights)[0]['name'])
+            everyone = rosters[home] + rosters[away]
+            yellows = {p['name'] for p in rng.sample(everyone, rng.randrange(4))}
+            reds = {p['name'] for p in rng.sample(everyone, 1 if rng.random() < 0.1 else 0)}
+            stats = collect_player_stats(rosters[home], rosters[away], home_score, away_score,
+                                         list(scorers), list(assists), list(yellows), list(reds))
+            scored = score_stats(stats)
+            for pid, stat in stats.items():
+                points = scored[pid]
+                player_points[pid] = player_points.get(pid, 0) + points
+                stat_rows.append((mid, pid) + tuple(stat[c] for c in STAT_COLUMNS) + (points,))
+        _insert_many(cursor, """
+            INSERT INTO player_match_stats
+                (match_id, player_id, goals, assists, yellows, reds, clean_sheet, appeared, points)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, stat_rows)
+        _insert_many(cursor, """
+            UPDATE players SET points = %s WHERE id = %s
+        """, [(points, pid) for pid, points in player_points.items()])
+        log(f"{len(match_rows)} matches, {len(stat_rows)} player match stats")
+
+        highlight_rows = [
+            (f"Highlight {i + 1}", f"https://www.youtube.com/watch?v=bench{i + 1}",
+             (now - timedelta(days=i)).date())
+            for i in range(highlights)
+        ]
+        _insert_many(cursor, """
+            INSERT INTO match_highlights (title, youtube_url, match_date) VALUES (%s, %s, %s)
+        """, highlight_rows)
+
+        # Current-squad pointers and selection counters, as save_squad_history would keep them
+        cursor.execute("""
+            UPDATE users u
+            JOIN (
+                SELECT user_id, MAX(id) AS squad_id FROM squad_history GROUP BY user_id
+            ) cur ON cur.user_id = u.id
+            JOIN squad_history s ON s.id = cur.squad_id
+            SET u.current_squad_id = s.id, u.locked_until = s.locked_until
+        """)
+        rebuild_stats(cursor)
+        cursor.execute("ANALYZE TABLE users, players, squad_history, squad_players, matches, match_highlights, player_match_stats")
+        cursor.fetchall()
+
+        conn.commit()
+        log("done")
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    return {
+        'players': len(players), 'users': len(user_rows), 'squads': len(squads),
+        'squad_players': len(squad_players), 'matches': len(match_rows),
+        'player_match_stats': len(stat_rows),
+        'highlights': len(highlight_rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--players-per-club", type=int, default=25)
+    parser.add_argument("--squads-per-user", type=int, default=2)
+    parser.add_argument("--seasons", type=int, default=1)
+    parser.add_argument("--highlights", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--force", action="store_true", help="seed even if the database already has squads")
+    args = parser.parse_args()
+    seed_league(users=args.users, players_per_club=args.players_per_club,
+                squads_per_user=args.squads_per_user, seasons=args.seasons,
+                highlights=args.highlights, seed=args.seed, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
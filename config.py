@@ -1,11 +1,42 @@
 import pymysql
 import os
+import threading
+from db_pool import ConnectionPool
+from query_stats import TimedCursor
 
-def get_database_connection():
+def open_raw_connection():
+    """Open a brand-new, unpooled connection (used by the pool and by one-off scripts)"""
     return pymysql.connect(
-        host=os.getenv("DB_HOST", "localhost"),  
-        user=os.getenv("DB_USER", "root"),  
-        password=os.getenv("DB_PASS", "root"),  
-        database=os.getenv("DB_NAME", "fantasy_appc"),  
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASS", "root"),
+        database=os.getenv("DB_NAME", "fantasy_appc"),
         ssl={'ssl': {}}
     )
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Process-wide connection pool, created on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    open_raw_connection,
+                    size=int(os.getenv("DB_POOL_SIZE", "10")),
+                    timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                    max_idle=float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+                    health_check_after=float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30")),
+                    cursor_wrapper=TimedCursor if os.getenv("QUERY_STATS", "1") == "1" else None,
+                )
+    return _pool
+
+def get_database_connection():
+    """Borrow a pooled connection; conn.close() returns it to the pool"""
+    return get_pool().acquire()
+
+def db_connection():
+    """Context manager form: `with db_connection() as conn: ...`"""
+    return get_pool().connection()
@@ -0,0 +1,76 @@
+"""
+Parallel prefetch of the dashboard's independent reads.
+
+load_dashboard_snapshot() runs every query on a thread pool of its own (each
+query borrows its own pooled connection) and waits at most `timeout` seconds
+for each one, so the page costs roughly its slowest query rather than the sum
+of all of them. The pool is per call so a busy server never leaves one rerun's
+queries queued behind another's. Queries must not call Streamlit APIs: they
+run outside the script thread.
+"""
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from log_config import get_logger
+
+log = get_logger("dashboard")
+
+DASHBOARD_WORKERS = int(os.getenv("DASHBOARD_WORKERS", "8"))
+DASHBOARD_QUERY_TIMEOUT = float(os.getenv("DASHBOARD_QUERY_TIMEOUT", "5"))
+
+
+class DashboardSnapshot:
+    """Results of one dashboard load; each query's result is an attribute"""
+
+    def __init__(self, values, errors, elapsed):
+        self.values = values
+        self.errors = errors  # {query name: error message} for failed / timed out queries
+        self.elapsed = elapsed
+
+    def __getattr__(self, name):
+        values = self.__dict__.get('values', {})
+        if name in values:
+            return values[name]
+        raise AttributeError(name)
+
+
+def load_dashboard_snapshot(queries, timeout=DASHBOARD_QUERY_TIMEOUT):
+    """Run `queries` ({name: zero-argument callable}) concurrently"""
+    started = time.monotonic()
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(len(queries), DASHBOARD_WORKERS)),
+        thread_name_prefix="dashboard"
+    )
+    # Each query runs in a copy of the caller's context so per-rerun query
+    # accounting (query_stats) still attributes it to this page
+    futures = {
+        name: executor.submit(contextvars.copy_context().run, query)
+        for name, query in queries.items()
+    }
+
+    values = {}
+    errors = {}
+    try:
+        for name, future in futures.items():
+            # Up to DASHBOARD_WORKERS queries start together, so waiting against
+            # a shared deadline gives each of them `timeout` seconds
+            remaining = max(0.0, started + timeout - time.monotonic())
+            try:
+                values[name] = future.result(timeout=remaining)
+            except FutureTimeout:
+                future.cancel()
+                values[name] = None
+                errors[name] = f"timed out after {timeout}s"
+            except Exception as e:
+                values[name] = None
+                errors[name] = str(e)
+    finally:
+        # Drop queries that never started; running ones finish in the background
+        # and return their connections
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for name, error in errors.items():
+        log.warning("Dashboard query failed", extra={'query': name, 'error': error})
+
+    return DashboardSnapshot(values, errors, time.monotonic() - started)
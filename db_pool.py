@@ -0,0 +1,185 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be borrowed within the timeout"""
+
+
+class PooledConnection:
+    """
+    Thin proxy around a raw pymysql connection borrowed from a ConnectionPool.
+
+    Everything is delegated to the underlying connection except close(), which
+    hands the connection back to the pool instead of tearing down the socket.
+    This keeps the existing `conn = get_database_connection() ... conn.close()`
+    helpers working unchanged.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+
+    def __getattr__(self, name):
+        if name in ('_pool', '_raw', '_released'):
+            raise AttributeError(name)
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._raw.cursor(*args, **kwargs)
+        if self._pool.cursor_wrapper is not None:
+            cursor = self._pool.cursor_wrapper(cursor)
+        return cursor
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw)
+
+    def __del__(self):
+        # Safety net for helpers that raise before reaching conn.close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            try:
+                self._raw.rollback()
+            except Exception:
+                pass
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of reusable database connections.
+
+    - at most `size` connections are open at any time; borrowers wait up to
+      `timeout` seconds for one to be returned
+    - connections that sat idle longer than `health_check_after` seconds are
+      pinged on checkout and replaced if the server has dropped them
+    - connections idle longer than `max_idle` seconds are closed
+    - cursors are passed through `cursor_wrapper` (e.g. for instrumentation)
+    """
+
+    def __init__(self, connect, size=5, timeout=10.0, max_idle=300.0,
+                 health_check_after=30.0, cursor_wrapper=None):
+        self._connect = connect
+        self.cursor_wrapper = cursor_wrapper
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self._idle = deque()  # (raw connection, last returned at)
+        self._open = 0
+        self._cond = threading.Condition()
+
+    def _evict_idle(self, now):
+        """Close connections idle past max_idle. Caller holds the lock."""
+        stale = []
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            stale.append(self._idle.popleft()[0])
+        self._open -= len(stale)
+        return stale
+
+    def _is_healthy(self, raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Borrow a connection, opening a new one if the pool has room"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                stale = self._evict_idle(time.monotonic())
+                raw = None
+                last_used = None
+                while raw is None:
+                    if self._idle:
+                        raw, last_used = self._idle.pop()
+                    elif self._open < self.size:
+                        self._open += 1
+                        break
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            _close_quietly(stale)
+                            raise PoolTimeout(
+                                f"No database connection available after {self.timeout}s "
+                                f"(pool size {self.size})"
+                            )
+                        self._cond.wait(remaining)
+            _close_quietly(stale)
+
+            if raw is None:
+                try:
+                    raw = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+                return PooledConnection(self, raw)
+
+            if time.monotonic() - last_used < self.health_check_after or self._is_healthy(raw):
+                return PooledConnection(self, raw)
+
+            # Server dropped it while idle; discard and try again
+            self._discard(raw)
+
+    def release(self, raw):
+        """Return a connection to the pool, ending any open transaction"""
+        try:
+            # Don't leak an open transaction (or its snapshot) to the next borrower
+            raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        with self._cond:
+            self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, raw):
+        _close_quietly([raw])
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with-block"""
+        conn = self.acquire()
+        with conn:
+            yield conn
+
+    def close_all(self):
+        """Close every idle connection (borrowed ones close on release)"""
+        with self._cond:
+            idle = [raw for raw, _ in self._idle]
+            self._idle.clear()
+            self._open -= len(idle)
+        _close_quietly(idle)
+
+    def stats(self):
+        with self._cond:
+            return {'size': self.size, 'open': self._open, 'idle': len(self._idle)}
+
+
+def _close_quietly(connections):
+    for raw in connections:
+        try:
+            raw.close()
+        except Exception:
+            pass
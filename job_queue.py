@@ -0,0 +1,173 @@
+"""
+Database-backed job queue for work that must not run in the Streamlit script
+thread (e.g. scoring every squad after a match result).
+
+The app enqueues a job row; scoring_worker.py claims queued jobs with
+SELECT ... FOR UPDATE SKIP LOCKED, so several workers can share the table
+without double-processing, and writes status / progress back as it goes. The
+admin page polls get_job() instead of blocking. Needs nothing but MySQL.
+
+Status: queued -> running -> succeeded | failed. A running job whose worker
+stopped heartbeating for JOB_STALE_AFTER seconds is put back in the queue. The
+window is longer than a scoring run may wait for the scoring lock (no
+heartbeats while waiting), and only the worker holding the current attempt can
+finish a job, so a worker that was presumed dead cannot overwrite the outcome.
+"""
+import json
+import os
+import socket
+from config import get_database_connection
+from pymysql.cursors import DictCursor
+from scoring import SCORING_LOCK_TIMEOUT
+
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", str(SCORING_LOCK_TIMEOUT + 300)))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+SCORE_MATCH = "score_match"
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_job(kind, payload):
+    """Queue a job; returns its id"""
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO jobs (kind, payload, status)
+            VALUES (%s, %s, 'queued')
+        """, (kind, json.dumps(payload)))
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def claim_next_job(worker):
+    """Mark the oldest queued job as running for `worker` and return it, or None"""
+    conn = get_database_connection()
+    cursor = conn.cursor(DictCursor)
+    try:
+        cursor.execute("""
+            SELECT id, kind, payload, attempts
+            FROM jobs
+            WHERE status = 'queued'
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """)
+        job = cursor.fetchone()
+        if job is None:
+            conn.rollback()
+            return None
+
+        cursor.execute("""
+            UPDATE jobs
+            SET status = 'running', worker = %s, attempts = attempts + 1,
+                started_at = NOW(), heartbeat_at = NOW(),
+                progress = 0, total = NULL, message = NULL, error = NULL
+            WHERE id = %s
+        """, (worker, job['id']))
+        conn.commit()
+
+        job['payload'] = json.loads(job['payload'])
+        job['attempts'] += 1
+        job['worker'] = worker
+        return job
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def report_progress(job_id, progress, total=None, message=None):
+    """Persist progress (also serves as the worker heartbeat)"""
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE jobs
+            SET progress = %s, total = COALESCE(%s, total),
+                message = COALESCE(%s, message), heartbeat_at = NOW()
+            WHERE id = %s AND status = 'running'
+        """, (progress, total, message, job_id))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def finish_job(job, message=None):
+    """Mark a claimed job (as returned by claim_next_job) succeeded; False if it was reclaimed"""
+    return _set_final_status(job, 'succeeded', message, None)
+
+
+def fail_job(job, error):
+    return _set_final_status(job, 'failed', None, error)
+
+
+def _set_final_status(job, status, message, error):
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        # Only the claim that is still current may settle the job
+        cursor.execute("""
+            UPDATE jobs
+            SET status = %s, message = COALESCE(%s, message), error = %s,
+                finished_at = NOW(), heartbeat_at = NOW()
+            WHERE id = %s AND worker = %s AND attempts = %s
+        """, (status, message, error, job['id'], job['worker'], job['attempts']))
+        conn.commit()
+        return cursor.rowcount == 1
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def requeue_stale_jobs(stale_after=JOB_STALE_AFTER):
+    """
+    Put running jobs whose worker went silent back in the queue (or fail them
+    after MAX_ATTEMPTS). Returns the number of jobs touched.
+    """
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE jobs
+            SET status = IF(attempts >= %s, 'failed', 'queued'),
+                error = IF(attempts >= %s, 'worker stopped responding', error),
+                finished_at = IF(attempts >= %s, NOW(), NULL),
+                worker = NULL
+            WHERE status = 'running'
+              AND heartbeat_at < NOW() - INTERVAL %s SECOND
+        """, (MAX_ATTEMPTS, MAX_ATTEMPTS, MAX_ATTEMPTS, stale_after))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_job(job_id):
+    conn = get_database_connection()
+    cursor = conn.cursor(DictCursor)
+    try:
+        cursor.execute("""
+            SELECT id, kind, payload, status, progress, total, message, error,
+                   attempts, worker, created_at, started_at, finished_at
+            FROM jobs
+            WHERE id = %s
+        """, (job_id,))
+        job = cursor.fetchone()
+        if job:
+            job['payload'] = json.loads(job['payload'])
+        return job
+    finally:
+        cursor.close()
+        conn.close()
+
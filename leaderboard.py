@@ -0,0 +1,113 @@
+"""
+Leaderboard reads backed by the users(points, id) index.
+
+- get_leaderboard_page(): keyset pagination, ordered by points then id
+  (both descending). `after` is the (points, id) of the last row of the
+  previous page; the filter is spelled out per column so MySQL turns it into
+  an index range starting right after that row (it does not range-optimize a
+  (points, id) < (x, y) row comparison).
+- get_user_rank(): rank and percentile for a points value, answered with a
+  binary search over a histogram of users per points value. The histogram is
+  one GROUP BY over the index, reloaded after a scoring run in this process
+  (scoring_version()) or a registration (invalidate_user_ranks()).
+
+users.points is NOT NULL (migration 13), so the keyset filter never skips a
+user.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from config import get_database_connection
+from pymysql.cursors import DictCursor
+from scoring import scoring_version
+
+PAGE_SIZE = 10
+
+_FIRST_PAGE_SQL = """
+    SELECT id, username, points
+    FROM users
+    ORDER BY points DESC, id DESC
+    LIMIT %s
+"""
+
+_NEXT_PAGE_SQL = """
+    SELECT id, username, points
+    FROM users
+    WHERE points < %s OR (points = %s AND id < %s)
+    ORDER BY points DESC, id DESC
+    LIMIT %s
+"""
+
+
+def get_leaderboard_page(after=None, page_size=PAGE_SIZE):
+    """One page of (id, username, points) rows, best first"""
+    conn = get_database_connection()
+    cursor = conn.cursor(DictCursor)
+
+    try:
+        if after is None:
+            cursor.execute(_FIRST_PAGE_SQL, (page_size,))
+        else:
+            cursor.execute(_NEXT_PAGE_SQL, (after[0], after[0], after[1], page_size))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+_histogram = None  # (version, points values ascending, users below each value, total)
+_histogram_version = 0
+_histogram_lock = threading.Lock()
+
+
+def _load_histogram(version):
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT points, COUNT(*) FROM users GROUP BY points ORDER BY points")
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    values, below = [], [0]
+    for points, users in rows:
+        values.append(points)
+        below.append(below[-1] + users)
+    return version, values, below, below[-1]
+
+
+def _points_histogram():
+    global _histogram
+    version = (scoring_version(), _histogram_version)
+    histogram = _histogram
+    if histogram is not None and histogram[0] == version:
+        return histogram
+    with _histogram_lock:
+        if _histogram is None or _histogram[0] != version:
+            _histogram = _load_histogram(version)
+        return _histogram
+
+
+def invalidate_user_ranks():
+    """Drop the cached histogram (a user was added); the next lookup reloads it"""
+    global _histogram_version
+    with _histogram_lock:
+        _histogram_version += 1
+
+
+def get_user_rank(points):
+    """
+    {'rank', 'total', 'percentile'} for a user with `points`. Tied users
+    share a rank; percentile is the share of users strictly behind.
+    """
+    _, values, below, total = _points_histogram()
+    if total == 0:
+        return None
+    points = points or 0
+    behind = below[bisect_left(values, points)]
+    ahead = total - below[bisect_right(values, points)]
+    return {
+        'rank': ahead + 1,
+        'total': total,
+        'percentile': behind * 100.0 / total,
+    }
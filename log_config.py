@@ -0,0 +1,102 @@
+"""
+Application logging.
+
+Records go through a QueueHandler, so a request thread or scoring run only
+pays for putting the record on a queue; a QueueListener thread formats and
+writes them to stdout (the container log stream).
+
+Loggers live under the "isl" namespace (get_logger("scoring") -> isl.scoring).
+Structured fields are passed with `extra`, e.g.
+
+    log.info("Squad scored", extra={'user_id': 7, 'squad_id': 41, 'delta': 12})
+
+and appear as key=value pairs (LOG_FORMAT=text, default) or JSON keys
+(LOG_FORMAT=json).
+
+- LOG_LEVEL      level of the "isl" loggers (default INFO)
+- SCORING_DEBUG  set to 1 to emit the per-user / per-player scoring detail
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+SCORING_DEBUG = os.getenv("SCORING_DEBUG", "0") == "1"
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def _fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED}
+
+
+class TextFormatter(logging.Formatter):
+    """`time LEVEL logger message key=value ...`"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record):
+        text = super().format(record)
+        fields = _fields(record)
+        if not fields:
+            return text
+        # Keep the fields on the first line, ahead of any traceback
+        first, newline, rest = text.partition("\n")
+        pairs = " ".join(f"{key}={value}" for key, value in fields.items())
+        return f"{first} {pairs}{newline}{rest}"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging():
+    """Attach the queue handler to the "isl" logger; safe to call repeatedly"""
+    global _listener
+    if _listener is not None:
+        return
+    with _setup_lock:
+        if _listener is not None:
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+        records = queue.SimpleQueue()
+        root = logging.getLogger("isl")
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(logging.handlers.QueueHandler(records))
+        root.propagate = False
+        if SCORING_DEBUG:
+            logging.getLogger("isl.scoring").setLevel(logging.DEBUG)
+
+        _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    setup_logging()
+    return logging.getLogger(f"isl.{name}")
@@ -0,0 +1,66 @@
+"""
+In-process cache of club logos.
+
+All logos in team_logos/ are decoded once, resized to the sizes the dashboard
+displays and kept as encoded PNG thumbnails, indexed by normalized team name.
+After warm-up, lookups touch neither the filesystem nor PIL.
+"""
+import io
+import os
+import threading
+from PIL import Image
+from log_config import get_logger
+
+log = get_logger("logos")
+
+LOGO_DIR = "team_logos"  # Directory containing team logos
+LOGO_WIDTHS = (50,)  # Widths the dashboard renders logos at
+
+_logos = None  # {normalized team name: {width: png bytes}}
+_logos_lock = threading.Lock()
+
+
+def normalize_team_name(team_name):
+    """'NorthEast United FC' -> 'northeastunitedfc' (matches the logo filenames)"""
+    return "".join(ch for ch in team_name.lower() if ch.isalnum())
+
+
+def _thumbnail(image, width):
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def warm_logo_cache():
+    """Decode and resize every logo once per process"""
+    global _logos
+    if _logos is not None:
+        return _logos
+    with _logos_lock:
+        if _logos is None:
+            logos = {}
+            if os.path.isdir(LOGO_DIR):
+                for filename in sorted(os.listdir(LOGO_DIR)):
+                    stem, ext = os.path.splitext(filename)
+                    if ext.lower() not in (".jpg", ".jpeg", ".png"):
+                        continue
+                    try:
+                        with Image.open(os.path.join(LOGO_DIR, filename)) as image:
+                            image = image.convert("RGBA")
+                            logos[normalize_team_name(stem)] = {
+                                width: _thumbnail(image, width) for width in LOGO_WIDTHS
+                            }
+                    except Exception as e:
+                        log.warning("Error loading logo", extra={'file': filename, 'error': str(e)})
+            _logos = logos
+    return _logos
+
+
+def get_team_logo(team_name, width=LOGO_WIDTHS[0]):
+    """PNG bytes of the team's logo at `width`, or None if there is no logo"""
+    sizes = warm_logo_cache().get(normalize_team_name(team_name))
+    if not sizes:
+        return None
+    return sizes.get(width) or sizes[LOGO_WIDTHS[0]]
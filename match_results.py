@@ -0,0 +1,148 @@
+"""
+Applying a finished match: the result row, the per-player match stats
+(player_match_stats) and every player's point change are written in one
+transaction, so a failure part-way leaves nothing half-applied.
+
+player_match_stats is the record of which match produced which points;
+players.points = players.baseline_points + the sum of a player's match points,
+and season_recompute.py can rebuild it from the stats at any time.
+Re-submitting a match replaces its stats and applies only the difference.
+
+Point values come from the scoring rules (scoring_rules.py); a match's stats
+are scored as one frame.
+"""
+import pandas as pd
+from config import get_database_connection
+from player_catalog import invalidate_player_catalog
+from scoring_rules import STAT_COLUMNS, get_rules
+
+
+def collect_player_stats(home_players, away_players, home_score, away_score,
+                         scorers, assists, yellows, reds):
+    """
+    Per-player stats for one match: {player_id: {'position', 'goals',
+    'assists', 'yellows', 'reds', 'clean_sheet', 'appeared'}}.
+
+    `scorers`, `assists`, `yellows` and `reds` are lists of player names (home
+    and away selections concatenated). A name resolves to the first matching
+    player in home_players + away_players. Players without any event get
+    appearance points.
+    """
+    match_players = home_players + away_players
+    by_name = {}
+    for player in match_players:
+        by_name.setdefault(player['name'], player)
+
+    stats = {}
+    for player in match_players:
+        stats.setdefault(player['id'], {
+            'position': player['position'],
+            'goals': 0, 'assists': 0, 'yellows': 0, 'reds': 0,
+            'clean_sheet': 0, 'appeared': 0,
+        })
+
+    # Clean sheets (recorded for every player; the rules decide which positions score)
+    if home_score == 0:
+        for player in away_players:
+            stats[player['id']]['clean_sheet'] += 1
+    if away_score == 0:
+        for player in home_players:
+            stats[player['id']]['clean_sheet'] += 1
+
+    # Goals, assists and cards
+    for names, column in ((scorers, 'goals'), (assists, 'assists'),
+                          (yellows, 'yellows'), (reds, 'reds')):
+        for name in names:
+            player = by_name.get(name)
+            if player:
+                stats[player['id']][column] += 1
+
+    # Appearance points for everyone else
+    involved = set(scorers) | set(assists) | set(yellows) | set(reds)
+    for player in match_players:
+        if player['name'] not in involved:
+            stats[player['id']]['appeared'] += 1
+
+    return stats
+
+
+def score_stats(stats, rules=None):
+    """{player_id: points} for a whole match's stats, scored in one pass"""
+    if not stats:
+        return {}
+    frame = pd.DataFrame.from_dict(stats, orient='index')
+    points = (rules or get_rules()).score_frame(frame)
+    return {int(player_id): int(p) for player_id, p in zip(frame.index, points)}
+
+
+def apply_player_deltas(cursor, deltas):
+    """Add every delta to players.points in a single UPDATE ... CASE statement"""
+    if not deltas:
+        return
+    ids = sorted(deltas)
+    cases = " ".join(["WHEN %s THEN %s"] * len(ids))
+    params = [value for player_id in ids for value in (player_id, deltas[player_id])]
+    cursor.execute(f"""
+        UPDATE players
+        SET points = points + CASE id {cases} ELSE 0 END
+        WHERE id IN %s
+    """, params + [tuple(ids)])
+
+
+def replace_match_stats(cursor, match_id, stats):
+    """
+    Replace the match's player_match_stats rows with `stats`; returns the
+    per-player point deltas against what was recorded before (non-zero only)
+    """
+    cursor.execute("""
+        SELECT player_id, points
+        FROM player_match_stats
+        WHERE match_id = %s
+        FOR UPDATE
+    """, (match_id,))
+    deltas = {player_id: -points for player_id, points in cursor.fetchall()}
+
+    cursor.execute("DELETE FROM player_match_stats WHERE match_id = %s", (match_id,))
+    scored = score_stats(stats)
+    rows = []
+    for player_id, stat in sorted(stats.items()):
+        points = scored[player_id]
+        deltas[player_id] = deltas.get(player_id, 0) + points
+        rows.append((match_id, player_id) + tuple(stat[c] for c in STAT_COLUMNS) + (points,))
+    if rows:
+        cursor.executemany("""
+            INSERT INTO player_match_stats
+                (match_id, player_id, goals, assists, yellows, reds, clean_sheet, appeared, points)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, rows)
+
+    return {player_id: delta for player_id, delta in deltas.items() if delta != 0}
+
+
+def apply_match_result(match_id, home_score, away_score, stats, status='completed'):
+    """
+    Record the match result and its player stats, and move players.points by
+    the difference, atomically. Returns the applied {player_id: delta}.
+    """
+    conn = get_database_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+            UPDATE matches
+            SET home_score = %s, away_score = %s, status = %s
+            WHERE id = %s
+        """, (home_score, away_score, status, match_id))
+
+        deltas = replace_match_stats(cursor, match_id, stats)
+        apply_player_deltas(cursor, deltas)
+
+        conn.commit()
+        invalidate_player_catalog()
+        return deltas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,501 @@
+"""
+Versioned schema migrations.
+
+Each migration is a (version, description, apply) entry in MIGRATIONS; apply()
+receives a cursor and must be safe to run against a database that was created
+by the old init_db() (hence the IF NOT EXISTS / column checks). Applied
+versions are recorded in the schema_version table.
+
+The app calls ensure_schema() once per process. Deployments can also run the
+migrations ahead of time:
+
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # list applied / pending versions
+"""
+import hashlib
+import sys
+import threading
+from config import get_database_connection
+from selection_stats import ACTIVE_MANAGERS
+
+MIGRATION_LOCK_NAME = "isl_fantasy_schema_migrations"
+MIGRATION_LOCK_TIMEOUT = 60
+
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+def add_column_if_missing(cursor, table, column, definition):
+    if not column_exists(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def index_covering_exists(cursor, table, columns):
+    """True if some index on `table` starts with exactly these columns"""
+    wanted = [c.strip().lower() for c in columns.split(",")]
+    cursor.execute("""
+        SELECT INDEX_NAME, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX)
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        GROUP BY INDEX_NAME
+    """, (table,))
+    for _, index_columns in cursor.fetchall():
+        existing = index_columns.lower().split(",")
+        if existing[:len(wanted)] == wanted:
+            return True
+    return False
+
+
+def add_index_if_missing(cursor, table, index, columns):
+    # InnoDB already indexes foreign key columns, so also skip when an
+    # equivalent index exists under another name
+    if not index_exists(cursor, table, index) and not index_covering_exists(cursor, table, columns):
+        cursor.execute(f"CREATE INDEX {index} ON {table} ({columns})")
+
+
+# --- Migration steps -------------------------------------------------------
+
+def _initial_schema(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            points INT DEFAULT 0,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS players (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            team VARCHAR(100) NOT NULL,
+            position ENUM('GK', 'DEF', 'MID', 'FWD') NOT NULL,
+            price DECIMAL(10,2) NOT NULL,
+            points INT DEFAULT 0
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_teams (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            player_id INT NOT NULL,
+            position_order INT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (player_id) REFERENCES players(id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS matches (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            home_team VARCHAR(100) NOT NULL,
+            away_team VARCHAR(100) NOT NULL,
+            match_time DATETIME NOT NULL,
+            home_logo VARCHAR(255),
+            away_logo VARCHAR(255),
+            status ENUM('upcoming', 'live', 'completed') DEFAULT 'upcoming'
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS squad_history (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            total_points INT DEFAULT 0,
+            locked_until DATETIME NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS squad_players (
+            squad_id INT NOT NULL,
+            player_id INT NOT NULL,
+            position_order INT NOT NULL,
+            points_earned INT DEFAULT 0,
+            FOREIGN KEY (squad_id) REFERENCES squad_history(id),
+            FOREIGN KEY (player_id) REFERENCES players(id),
+            PRIMARY KEY (squad_id, player_id)
+        )
+    """)
+
+
+def _admin_user(cursor):
+    add_column_if_missing(cursor, "users", "is_admin", "BOOLEAN DEFAULT FALSE")
+
+    cursor.execute("""
+        INSERT INTO users (username, password, is_admin)
+        SELECT 'admin', %s, TRUE
+        WHERE NOT EXISTS (
+            SELECT 1 FROM users WHERE username = 'admin'
+        )
+    """, (hash_password('admin123'),))
+
+
+def _match_highlights(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS match_highlights (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            title VARCHAR(255) NOT NULL,
+            youtube_url VARCHAR(255) NOT NULL,
+            match_date DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _match_scores(cursor):
+    # record_match_result() and the admin "Add Match" form write these columns,
+    # but the original CREATE TABLE never declared them
+    add_column_if_missing(cursor, "matches", "home_score", "INT NULL")
+    add_column_if_missing(cursor, "matches", "away_score", "INT NULL")
+
+
+def _squad_player_lookup_index(cursor):
+    # Match-scoped scoring looks squads up by the players that just scored
+    add_index_if_missing(cursor, "squad_players", "idx_squad_players_player", "player_id")
+
+
+def _leaderboard_index(cursor):
+    # Leaderboard pages (range scans) and the rank histogram (index-only) use this
+    add_index_if_missing(cursor, "users", "idx_users_points", "points, id")
+
+
+def _selection_stats(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS player_selection_stats (
+            player_id INT PRIMARY KEY,
+            current_owners INT NOT NULL DEFAULT 0,
+            total_selections INT NOT NULL DEFAULT 0,
+            FOREIGN KEY (player_id) REFERENCES players(id)
+        )
+    """)
+    add_index_if_missing(cursor, "player_selection_stats", "idx_selection_owners", "current_owners")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS league_counters (
+            name VARCHAR(50) PRIMARY KEY,
+            value BIGINT NOT NULL DEFAULT 0
+        )
+    """)
+
+    # Backfill from existing history. Frozen here: selection_stats.rebuild_stats()
+    # has since moved to users.current_squad_id, which migration 8 adds (and
+    # rebuilds the counters with).
+    cursor.execute("DELETE FROM player_selection_stats")
+    cursor.execute("""
+        INSERT INTO player_selection_stats (player_id, current_owners, total_selections)
+        SELECT p.id, COALESCE(cur.owners, 0), COALESCE(tot.selections, 0)
+        FROM players p
+        LEFT JOIN (
+            SELECT sp.player_id, COUNT(DISTINCT sh.user_id) AS owners
+            FROM squad_history sh
+            JOIN (
+                SELECT user_id, MAX(created_at) AS latest
+                FROM squad_history
+                GROUP BY user_id
+            ) latest ON latest.user_id = sh.user_id AND latest.latest = sh.created_at
+            JOIN squad_players sp ON sp.squad_id = sh.id
+            GROUP BY sp.player_id
+        ) cur ON cur.player_id = p.id
+        LEFT JOIN (
+            SELECT player_id, COUNT(*) AS selections
+            FROM squad_players
+            GROUP BY player_id
+        ) tot ON tot.player_id = p.id
+    """)
+    cursor.execute("""
+        INSERT INTO league_counters (name, value)
+        SELECT %s, COUNT(DISTINCT user_id) FROM squad_history
+        ON DUPLICATE KEY UPDATE value = VALUES(value)
+    """, (ACTIVE_MANAGERS,))
+
+
+def _current_squad_pointer(cursor):
+    add_column_if_missing(cursor, "users", "current_squad_id", "INT NULL")
+    add_column_if_missing(cursor, "users", "locked_until", "DATETIME NULL")
+    add_index_if_missing(cursor, "squad_history", "idx_squad_history_user_created", "user_id, created_at")
+
+    # Point every user at their latest squad (highest id on created_at ties)
+    cursor.execute("""
+        UPDATE users u
+        JOIN (
+            SELECT sh.user_id, MAX(sh.id) AS squad_id
+            FROM squad_history sh
+            JOIN (
+                SELECT user_id, MAX(created_at) AS latest
+                FROM squad_history
+                GROUP BY user_id
+            ) latest ON latest.user_id = sh.user_id AND latest.latest = sh.created_at
+            GROUP BY sh.user_id
+        ) cur ON cur.user_id = u.id
+        JOIN squad_history s ON s.id = cur.squad_id
+        SET u.current_squad_id = s.id, u.locked_until = s.locked_until
+    """)
+
+    # Recount the selection counters from the new pointer (frozen copy of
+    # selection_stats.rebuild_stats() as it was for this migration)
+    cursor.execute("DELETE FROM player_selection_stats")
+    cursor.execute("""
+        INSERT INTO player_selection_stats (player_id, current_owners, total_selections)
+        SELECT p.id, COALESCE(cur.owners, 0), COALESCE(tot.selections, 0)
+        FROM players p
+        LEFT JOIN (
+            SELECT sp.player_id, COUNT(*) AS owners
+            FROM users u
+            JOIN squad_players sp ON sp.squad_id = u.current_squad_id
+            GROUP BY sp.player_id
+        ) cur ON cur.player_id = p.id
+        LEFT JOIN (
+            SELECT player_id, COUNT(*) AS selections
+            FROM squad_players
+            GROUP BY player_id
+        ) tot ON tot.player_id = p.id
+    """)
+    cursor.execute("""
+        INSERT INTO league_counters (name, value)
+        SELECT %s, COUNT(*) FROM users WHERE current_squad_id IS NOT NULL
+        ON DUPLICATE KEY UPDATE value = VALUES(value)
+    """, (ACTIVE_MANAGERS,))
+
+
+def _secondary_indexes(cursor):
+    # Access paths of the queries in app.py; see benchmarks/check_query_plans.py
+    add_index_if_missing(cursor, "players", "idx_players_position_points", "position, points")
+    add_index_if_missing(cursor, "players", "idx_players_team", "team")
+    add_index_if_missing(cursor, "players", "idx_players_points", "points")
+    add_index_if_missing(cursor, "matches", "idx_matches_match_time", "match_time")
+    add_index_if_missing(cursor, "match_highlights", "idx_highlights_match_date", "match_date")
+
+
+def _jobs(cursor):
+    # Background job queue, see job_queue.py
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            kind VARCHAR(50) NOT NULL,
+            payload TEXT NOT NULL,
+            status ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+            progress INT NOT NULL DEFAULT 0,
+            total INT NULL,
+            message VARCHAR(255) NULL,
+            error TEXT NULL,
+            attempts INT NOT NULL DEFAULT 0,
+            worker VARCHAR(100) NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            started_at DATETIME NULL,
+            heartbeat_at DATETIME NULL,
+            finished_at DATETIME NULL
+        )
+    """)
+    add_index_if_missing(cursor, "jobs", "idx_jobs_status", "status, id")
+
+
+def _scoring_runs(cursor):
+    # Checkpoints of chunked scoring runs, see scoring.update_user_points_set_based
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scoring_runs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            player_ids TEXT NULL,
+            status ENUM('running', 'completed') NOT NULL DEFAULT 'running',
+            last_user_id INT NOT NULL DEFAULT 0,
+            users INT NOT NULL DEFAULT 0,
+            squads INT NOT NULL DEFAULT 0,
+            points BIGINT NOT NULL DEFAULT 0,
+            started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME NULL,
+            finished_at DATETIME NULL
+        )
+    """)
+    add_index_if_missing(cursor, "scoring_runs", "idx_scoring_runs_status", "status")
+
+
+def _player_match_stats(cursor):
+    # Per-match record of how each player earned points, see match_results.py.
+    # baseline_points holds the part of players.points no recorded match
+    # explains (everything credited before this table existed).
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS player_match_stats (
+            match_id INT NOT NULL,
+            player_id INT NOT NULL,
+            goals INT NOT NULL DEFAULT 0,
+            assists INT NOT NULL DEFAULT 0,
+            yellows INT NOT NULL DEFAULT 0,
+            reds INT NOT NULL DEFAULT 0,
+            clean_sheet INT NOT NULL DEFAULT 0,
+            appeared INT NOT NULL DEFAULT 0,
+            points INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (match_id, player_id),
+            FOREIGN KEY (match_id) REFERENCES matches(id),
+            FOREIGN KEY (player_id) REFERENCES players(id)
+        )
+    """)
+    add_index_if_missing(cursor, "player_match_stats", "idx_player_match_stats_player", "player_id")
+
+    if not column_exists(cursor, "players", "baseline_points"):
+        cursor.execute("ALTER TABLE players ADD COLUMN baseline_points INT NOT NULL DEFAULT 0")
+        cursor.execute("UPDATE players SET baseline_points = COALESCE(points, 0)")
+
+
+def _users_points_not_null(cursor):
+    # NULL points would fall out of the leaderboard's (points, id) keyset
+    # comparison and its rank counts
+    cursor.execute("UPDATE users SET points = 0 WHERE points IS NULL")
+    cursor.execute("ALTER TABLE users MODIFY points INT NOT NULL DEFAULT 0")
+
+
+def _match_status_index(cursor):
+    # get_matches_for_date() and the admin match lists filter on status
+    add_index_if_missing(cursor, "matches", "idx_matches_status_time", "status, match_time")
+
+
+def _clean_sheets_for_all_positions(cursor):
+    # Match stats recorded before the scoring rules file only have clean_sheet
+    # for GK / DEF. Record it for every player of a team that kept one, so rule
+    # changes (season_recompute --rules / --what-if) apply to the whole season.
+    # Points don't change: the rules in force give other positions 0 for it.
+    cursor.execute("""
+        UPDATE player_match_stats s
+        JOIN matches m ON m.id = s.match_id
+        JOIN players p ON p.id = s.player_id
+        SET s.clean_sheet = 1
+        WHERE s.clean_sheet = 0
+          AND ((p.team = m.home_team AND m.away_score = 0)
+            OR (p.team = m.away_team AND m.home_score = 0))
+    """)
+
+
+MIGRATIONS = [
+    (1, "initial schema", _initial_schema),
+    (2, "admin flag and default admin user", _admin_user),
+    (3, "match highlights", _match_highlights),
+    (4, "match score columns", _match_scores),
+    (5, "squad_players.player_id index", _squad_player_lookup_index),
+    (6, "users.points leaderboard index", _leaderboard_index),
+    (7, "player selection counters", _selection_stats),
+    (8, "users.current_squad_id pointer", _current_squad_pointer),
+    (9, "secondary indexes for app queries", _secondary_indexes),
+    (10, "background jobs table", _jobs),
+    (11, "scoring run checkpoints", _scoring_runs),
+    (12, "per-match player stats", _player_match_stats),
+    (13, "users.points NOT NULL", _users_points_not_null),
+    (14, "matches.status index", _match_status_index),
+    (15, "clean sheets recorded for all positions", _clean_sheets_for_all_positions),
+]
+
+
+# --- Runner ----------------------------------------------------------------
+
+def _ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_version")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate():
+    """Apply every pending migration in order; returns the versions applied"""
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    applied_now = []
+
+    try:
+        # Serialize concurrent app processes / CLI runs
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Timed out waiting for the schema migration lock")
+
+        try:
+            _ensure_version_table(cursor)
+            done = applied_versions(cursor)
+
+            for version, description, apply in MIGRATIONS:
+                if version in done:
+                    continue
+                apply(cursor)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                conn.commit()
+                applied_now.append(version)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+            cursor.fetchone()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    return applied_now
+
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def ensure_schema():
+    """Run pending migrations once per process; later calls are free"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            migrate()
+            _schema_ready = True
+
+
+def status():
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        _ensure_version_table(cursor)
+        done = applied_versions(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+    return [(version, description, version in done) for version, description, _ in MIGRATIONS]
+
+
+if __name__ == "__main__":
+    if "--status" in sys.argv[1:]:
+        for version, description, is_applied in status():
+            print(f"{version:>4}  {'applied' if is_applied else 'pending':<8} {description}")
+    else:
+        applied = migrate()
+        if applied:
+            print(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+        else:
+            print("Schema is up to date")
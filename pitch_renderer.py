@@ -0,0 +1,58 @@
+"""
+Cached 4-4-2 pitch images for the Create Team page and the locked squad view.
+
+The base image and font are decoded once per process. Finished images are
+memoized as encoded JPEG bytes, keyed by the ordered tuple of the 11 names in
+position_order (GK, DEF x4, MID x4, FWD x2), with LRU eviction.
+"""
+import io
+import os
+import threading
+from functools import lru_cache
+from PIL import Image, ImageFont, ImageDraw
+
+PITCH_IMAGE_PATH = "football_pitch.jpg"
+PITCH_CACHE_SIZE = int(os.getenv("PITCH_CACHE_SIZE", "256"))
+
+# Text anchor per position_order slot
+POSITIONS = {
+    'GK': [(130, 490)],
+    'DEF': [(40, 380), (90, 410), (210, 410), (300, 380)],
+    'MID': [(30, 230), (90, 290), (240, 290), (300, 230)],
+    'FWD': [(100, 130), (220, 130)]
+}
+SLOT_COORDS = POSITIONS['GK'] + POSITIONS['DEF'] + POSITIONS['MID'] + POSITIONS['FWD']
+
+_assets = None
+_assets_lock = threading.Lock()
+
+
+def _load_assets():
+    """Decoded base pitch and font, loaded on first use"""
+    global _assets
+    if _assets is None:
+        with _assets_lock:
+            if _assets is None:
+                with Image.open(PITCH_IMAGE_PATH) as image:
+                    base = image.convert("RGB")
+                try:
+                    font = ImageFont.truetype("arial.ttf", 12)
+                except IOError:
+                    font = ImageFont.load_default()
+                _assets = (base, font)
+    return _assets
+
+
+@lru_cache(maxsize=PITCH_CACHE_SIZE)
+def render_pitch(names):
+    """JPEG bytes of the pitch with `names` (11 slots, '' for empty) drawn on it"""
+    base, font = _load_assets()
+    pitch_image = base.copy()
+    draw = ImageDraw.Draw(pitch_image)
+    for coords, name in zip(SLOT_COORDS, names):
+        if name:
+            draw.text(coords, name, fill="white", font=font)
+
+    buffer = io.BytesIO()
+    pitch_image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
@@ -0,0 +1,74 @@
+"""
+Process-wide, read-only snapshot of the players table.
+
+The Create Team page looks players up by id and by position on every rerun;
+the catalog answers those from memory. It is loaded once, shared by all
+sessions, and reloaded only after invalidate_player_catalog() is called by
+code that changes players (match results, point recomputation).
+
+Player dicts are shared between sessions and must not be mutated by callers.
+"""
+import threading
+from config import get_database_connection
+from pymysql.cursors import DictCursor
+
+POSITIONS = ('GK', 'DEF', 'MID', 'FWD')
+
+
+class PlayerCatalog:
+    def __init__(self, players, version):
+        self.version = version
+        self.by_id = {}
+        self.by_position = {position: [] for position in POSITIONS}
+        for player in players:
+            player['price'] = float(player['price'])  # Convert Decimal to float
+            self.by_id[player['id']] = player
+            self.by_position.setdefault(player['position'], []).append(player)
+        for position_players in self.by_position.values():
+            position_players.sort(key=lambda p: (-(p['points'] or 0), p['id']))
+
+    def get(self, player_id):
+        return self.by_id.get(player_id)
+
+    def for_position(self, position):
+        """Players of one position, best points first"""
+        return self.by_position.get(position, [])
+
+    def __len__(self):
+        return len(self.by_id)
+
+
+_catalog = None
+_version = 0
+_lock = threading.Lock()
+
+
+def _load(version):
+    conn = get_database_connection()
+    cursor = conn.cursor(DictCursor)
+    try:
+        cursor.execute("SELECT * FROM players")
+        players = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return PlayerCatalog(players, version)
+
+
+def get_player_catalog():
+    """Current catalog, loading it on first use or after an invalidation"""
+    global _catalog
+    catalog = _catalog
+    if catalog is not None and catalog.version == _version:
+        return catalog
+    with _lock:
+        if _catalog is None or _catalog.version != _version:
+            _catalog = _load(_version)
+        return _catalog
+
+
+def invalidate_player_catalog():
+    """Drop the cached catalog; the next reader reloads it"""
+    global _version
+    with _lock:
+        _version += 1
@@ -0,0 +1,233 @@
+"""
+Query instrumentation for pooled connections.
+
+Every cursor handed out by the pool is wrapped in a TimedCursor, which records
+for each execute()/executemany():
+
+- the statement fingerprint (whitespace collapsed, placeholders as ?)
+- latency and rows returned / affected
+- the calling function (first frame outside the database layer)
+
+Stats are aggregated process-wide per fingerprint, and per Streamlit rerun and
+page between begin_rerun() / end_rerun(). Statements slower than
+SLOW_QUERY_MS go to the slow-query log (SLOW_QUERY_LOG).
+"""
+import contextvars
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "slow_queries.log")
+
+# Frames from these files are the database layer, not the caller
+_INTERNAL_FILES = {"query_stats.py", "db_pool.py", "config.py"}
+
+slow_query_logger = logging.getLogger("isl.slow_queries")
+if not slow_query_logger.handlers and SLOW_QUERY_LOG:
+    _handler = logging.FileHandler(SLOW_QUERY_LOG, delay=True)
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    slow_query_logger.addHandler(_handler)
+    slow_query_logger.setLevel(logging.INFO)
+    slow_query_logger.propagate = False
+
+_lock = threading.Lock()
+_query_stats = {}  # fingerprint -> QueryStat
+_page_stats = {}  # page -> PageStat
+_current_rerun = contextvars.ContextVar("current_rerun", default=None)
+_rerun_listeners = []  # called with each finished RerunStat
+
+
+class QueryStat:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.callers = set()
+
+
+class RerunStat:
+    """Queries issued during one rerun of one page"""
+
+    def __init__(self, page):
+        self.page = page
+        self.queries = 0
+        self.db_ms = 0.0
+        self.started = time.perf_counter()
+        self.wall_ms = None  # set by end_rerun()
+
+
+class PageStat:
+    def __init__(self, page):
+        self.page = page
+        self.reruns = 0
+        self.queries = 0
+        self.db_ms = 0.0
+        self.wall_ms = 0.0
+        self.max_queries = 0
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """Normalized statement text used to group executions of the same query"""
+    text = re.sub(r"\s+", " ", sql).strip()
+    text = re.sub(r"%\(\w+\)s|%s", "?", text)
+    text = re.sub(r"'(?:[^'\\]|\\.)*'", "?", text)
+    text = re.sub(r"\b\d+(?:\.\d+)?\b", "?", text)
+    # Variable-length lists (IN (...), CASE WHEN ... chains, VALUES rows)
+    text = re.sub(r"(WHEN \? THEN \? ?)+", "WHEN ? THEN ? ... ", text)
+    text = re.sub(r"\(\?(?:, ?\?)+\)", "(?, ...)", text)
+    return text
+
+
+def _caller():
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.basename(frame.f_code.co_filename)
+        if filename not in _INTERNAL_FILES:
+            return f"{filename}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+def record(sql, elapsed_ms, rows, caller):
+    key = fingerprint(sql)
+    with _lock:
+        stat = _query_stats.get(key)
+        if stat is None:
+            stat = _query_stats[key] = QueryStat(key)
+        stat.calls += 1
+        stat.total_ms += elapsed_ms
+        stat.max_ms = max(stat.max_ms, elapsed_ms)
+        stat.rows += max(rows, 0)
+        stat.callers.add(caller)
+
+        rerun = _current_rerun.get()
+        if rerun is not None:
+            rerun.queries += 1
+            rerun.db_ms += elapsed_ms
+
+    if elapsed_ms >= SLOW_QUERY_MS:
+        slow_query_logger.info(
+            "%.1fms rows=%s caller=%s page=%s sql=%s",
+            elapsed_ms, rows, caller, rerun.page if rerun else "-", key
+        )
+
+
+class TimedCursor:
+    """Cursor proxy that times execute() / executemany()"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        if name == "_cursor":
+            raise AttributeError(name)
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+        return False
+
+    def _timed(self, method, query, args):
+        caller = _caller()
+        started = time.perf_counter()
+        try:
+            return method(query, args)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            record(query, elapsed_ms, self._cursor.rowcount, caller)
+
+    def execute(self, query, args=None):
+        return self._timed(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, query, args)
+
+
+def begin_rerun(page):
+    """Start attributing queries in this context to one rerun of `page`"""
+    return _current_rerun.set(RerunStat(page))
+
+
+def end_rerun(token):
+    """Fold the current rerun into the per-page stats and return it"""
+    rerun = _current_rerun.get()
+    _current_rerun.reset(token)
+    if rerun is None:
+        return None
+    wall_ms = rerun.wall_ms = (time.perf_counter() - rerun.started) * 1000
+    with _lock:
+        page = _page_stats.get(rerun.page)
+        if page is None:
+            page = _page_stats[rerun.page] = PageStat(rerun.page)
+        page.reruns += 1
+        page.queries += rerun.queries
+        page.db_ms += rerun.db_ms
+        page.wall_ms += wall_ms
+        page.max_queries = max(page.max_queries, rerun.queries)
+        listeners = list(_rerun_listeners)
+    for listener in listeners:
+        listener(rerun)
+    return rerun
+
+
+def add_rerun_listener(listener):
+    """Call listener(rerun) after every finished rerun (e.g. a load harness)"""
+    with _lock:
+        _rerun_listeners.append(listener)
+
+
+def remove_rerun_listener(listener):
+    """Undo add_rerun_listener"""
+    with _lock:
+        _rerun_listeners.remove(listener)
+
+
+def current_rerun():
+    return _current_rerun.get()
+
+
+def top_queries(limit=20):
+    """Query stats as dicts, highest total time first"""
+    with _lock:
+        stats = sorted(_query_stats.values(), key=lambda s: s.total_ms, reverse=True)[:limit]
+        return [{
+            'query': s.fingerprint,
+            'calls': s.calls,
+            'total_ms': round(s.total_ms, 1),
+            'avg_ms': round(s.total_ms / s.calls, 2),
+            'max_ms': round(s.max_ms, 1),
+            'rows': s.rows,
+            'callers': ", ".join(sorted(s.callers)),
+        } for s in stats]
+
+
+def page_summary():
+    with _lock:
+        return [{
+            'page': p.page,
+            'reruns': p.reruns,
+            'queries_per_rerun': round(p.queries / p.reruns, 1),
+            'max_queries': p.max_queries,
+            'db_ms_per_rerun': round(p.db_ms / p.reruns, 1),
+            'wall_ms_per_rerun': round(p.wall_ms / p.reruns, 1),
+        } for p in sorted(_page_stats.values(), key=lambda p: p.page)]
+
+
+def reset_stats():
+    with _lock:
+        _query_stats.clear()
+        _page_stats.clear()
@@ -0,0 +1,263 @@
+"""
+Points reconciliation: check (and optionally repair) the totals that scoring
+maintains incrementally against the rows they are derived from.
+
+Checks, in dependency order:
+
+- players: players.points = baseline_points + SUM(player_match_stats.points)
+- earned:  squad_players.points_earned >= 0 (scoring only ever raises it, from
+           NULL to the highest players.points seen while the squad was current)
+- squads:  squad_history.total_points = SUM(squad_players.points_earned)
+- users:   users.points = SUM(squad_history.total_points) over the user's squads
+
+Every check is one set-based statement over the whole table that returns, per
+partition of RECONCILE_PARTITION_SIZE ids (user ids for earned, squads and users,
+player ids for players), the row count and SUM(CRC32(id:value)) of the stored
+and of the expected values. Only partitions whose checksums differ are read
+row by row.
+
+    python reconcile.py            # report; exit status 1 if anything is off
+    python reconcile.py --repair   # set every mismatched row to its expected value
+
+--repair holds the scoring lock, so no scoring run interleaves, and commits
+one partition at a time; the squads and users checks that follow carry an
+earned repair up to the totals. The gap between players.points and
+points_earned in current squads is reported in both directions, for
+information only: points behind are pending (the next scoring run credits
+them), points ahead were credited before the player lost points to cards or a
+re-submitted match, and stay credited.
+"""
+import argparse
+import os
+import sys
+import time
+from pymysql.cursors import DictCursor
+from config import get_database_connection
+from scoring import SCORING_LOCK_NAME, SCORING_LOCK_TIMEOUT, bump_scoring_version
+from log_config import get_logger
+
+RECONCILE_PARTITION_SIZE = int(os.getenv("RECONCILE_PARTITION_SIZE", "1000"))
+# Mismatched rows listed per check in the report
+SAMPLE_SIZE = 20
+
+MAX_ID = 2 ** 31 - 1
+
+log = get_logger("reconcile")
+
+# (name, table, key columns, column, rows): `rows` selects the key columns,
+# part, stored and expected for ids in [lo, hi], one row per row of `table`.
+# Every `rows` query groups by the table's key, so it is materialized and the
+# repair UPDATE may read the table it writes.
+CHECKS = [
+    ('players', 'players', ('id',), 'points', """
+        SELECT p.id AS id,
+               p.id DIV %(size)s AS part,
+               p.points AS stored,
+               p.baseline_points + COALESCE(SUM(s.points), 0) AS expected
+        FROM players p
+        LEFT JOIN player_match_stats s ON s.player_id = p.id
+        WHERE p.id BETWEEN %(lo)s AND %(hi)s
+        GROUP BY p.id
+    """),
+    ('earned', 'squad_players', ('squad_id', 'player_id'), 'points_earned', """
+        SELECT sp.squad_id AS squad_id,
+               sp.player_id AS player_id,
+               sh.user_id DIV %(size)s AS part,
+               COALESCE(sp.points_earned, 0) AS stored,
+               GREATEST(COALESCE(sp.points_earned, 0), 0) AS expected
+        FROM squad_history sh
+        JOIN squad_players sp ON sp.squad_id = sh.id
+        WHERE sh.user_id BETWEEN %(lo)s AND %(hi)s
+        GROUP BY sp.squad_id, sp.player_id
+    """),
+    ('squads', 'squad_history', ('id',), 'total_points', """
+        SELECT sh.id AS id,
+               sh.user_id DIV %(size)s AS part,
+               sh.total_points AS stored,
+               COALESCE(SUM(sp.points_earned), 0) AS expected
+        FROM squad_history sh
+        LEFT JOIN squad_players sp ON sp.squad_id = sh.id
+        WHERE sh.user_id BETWEEN %(lo)s AND %(hi)s
+        GROUP BY sh.id
+    """),
+    ('users', 'users', ('id',), 'points', """
+        SELECT u.id AS id,
+               u.id DIV %(size)s AS part,
+               u.points AS stored,
+               COALESCE(SUM(sh.total_points), 0) AS expected
+        FROM users u
+        LEFT JOIN squad_history sh ON sh.user_id = u.id
+        WHERE u.id BETWEEN %(lo)s AND %(hi)s
+        GROUP BY u.id
+    """),
+]
+
+
+def partition_checksums(cursor, keys, rows_sql, size):
+    """{part: (rows, stored checksum, expected checksum)} over the whole table"""
+    key = ", ".join(keys)
+    cursor.execute(f"""
+        SELECT part,
+               COUNT(*) AS row_count,
+               SUM(CRC32(CONCAT_WS(':', {key}, IFNULL(stored, 'null')))) AS stored_sum,
+               SUM(CRC32(CONCAT_WS(':', {key}, expected))) AS expected_sum
+        FROM ({rows_sql}) r
+        GROUP BY part
+    """, {'size': size, 'lo': 0, 'hi': MAX_ID})
+    return {
+        row['part']: (row['row_count'], int(row['stored_sum']), int(row['expected_sum']))
+        for row in cursor.fetchall()
+    }
+
+
+def _part_range(part, size):
+    return part * size, part * size + size - 1
+
+
+def mismatched_rows(cursor, keys, rows_sql, part, size):
+    key = ", ".join(keys)
+    cursor.execute(f"""
+        SELECT {key}, stored, expected
+        FROM ({rows_sql}) r
+        WHERE NOT (stored <=> expected)
+        ORDER BY {key}
+    """, dict(zip(('lo', 'hi'), _part_range(part, size)), size=size))
+    return cursor.fetchall()
+
+
+def repair_partition(cursor, table, keys, column, rows_sql, part, size):
+    """Set every mismatched row of the partition to its expected value; returns rows changed"""
+    # The derived table is materialized (GROUP BY), so it may read `table` too
+    join = " AND ".join(f"r.{key} = t.{key}" for key in keys)
+    return cursor.execute(f"""
+        UPDATE {table} t
+        JOIN ({rows_sql}) r ON {join}
+        SET t.{column} = r.expected
+        WHERE NOT (r.stored <=> r.expected)
+    """, dict(zip(('lo', 'hi'), _part_range(part, size)), size=size))
+
+
+def credit_gap(cursor):
+    """
+    Gap between players.points and points_earned in current squads, both ways:
+    {'behind_slots', 'behind_points'} not credited yet (pending) and
+    {'ahead_slots', 'ahead_points'} credited before the player's points fell.
+    Neither is a mismatch: scoring keeps the high-water mark.
+    """
+    cursor.execute("""
+        SELECT COALESCE(SUM(gap > 0), 0) AS behind_slots,
+               COALESCE(SUM(GREATEST(gap, 0)), 0) AS behind_points,
+               COALESCE(SUM(gap < 0), 0) AS ahead_slots,
+               COALESCE(SUM(GREATEST(-gap, 0)), 0) AS ahead_points
+        FROM (
+            SELECT p.points - COALESCE(sp.points_earned, 0) AS gap
+            FROM users u
+            JOIN squad_players sp ON sp.squad_id = u.current_squad_id
+            JOIN players p ON p.id = sp.player_id
+        ) g
+    """)
+    return {key: int(value) for key, value in cursor.fetchone().items()}
+
+
+def run_check(conn, cursor, name, table, keys, column, rows_sql, repair=False, size=None):
+    size = size or RECONCILE_PARTITION_SIZE
+    started = time.perf_counter()
+    checksums = partition_checksums(cursor, keys, rows_sql, size)
+    bad_parts = sorted(part for part, (_, stored, expected) in checksums.items() if stored != expected)
+
+    mismatches = []
+    repaired = 0
+    for part in bad_parts:
+        mismatches.extend(mismatched_rows(cursor, keys, rows_sql, part, size))
+        if repair:
+            repaired += repair_partition(cursor, table, keys, column, rows_sql, part, size)
+            conn.commit()
+
+    return {
+        'check': name,
+        'partitions': len(checksums),
+        'rows': sum(count for count, _, _ in checksums.values()),
+        'mismatched_partitions': len(bad_parts),
+        'mismatched_rows': len(mismatches),
+        'points_off': sum(abs((row['stored'] or 0) - row['expected']) for row in mismatches),
+        'repaired_rows': repaired,
+        'sample': [
+            (":".join(str(row[key]) for key in keys), row['stored'], row['expected'])
+            for row in mismatches[:SAMPLE_SIZE]
+        ],
+        'ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def reconcile(repair=False, size=None):
+    """Run every check (repairing in order if asked); returns a summary dict"""
+    started = time.perf_counter()
+    conn = get_database_connection()
+    cursor = conn.cursor(DictCursor)
+    locked = False
+    try:
+        if repair:
+            cursor.execute("SELECT GET_LOCK(%s, %s) AS locked", (SCORING_LOCK_NAME, SCORING_LOCK_TIMEOUT))
+            if cursor.fetchone()['locked'] != 1:
+                raise RuntimeError("Timed out waiting for a scoring run to finish")
+            locked = True
+        else:
+            # Every check reads the same snapshot
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+
+        gap = credit_gap(cursor)
+        # Later checks read what the earlier ones repaired
+        checks = [run_check(conn, cursor, *check, repair=repair, size=size) for check in CHECKS]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if locked:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (SCORING_LOCK_NAME,))
+            cursor.fetchone()
+        cursor.close()
+        conn.close()
+
+    summary = {
+        'checks': checks,
+        'mismatched_rows': sum(check['mismatched_rows'] for check in checks),
+        'repaired_rows': sum(check['repaired_rows'] for check in checks),
+        **gap,
+        'total_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+    if summary['repaired_rows']:
+        bump_scoring_version()
+    report = log.warning if summary['mismatched_rows'] else log.info
+    report("Points reconciled", extra={key: value for key, value in summary.items() if key != 'checks'})
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repair", action="store_true", help="fix mismatched rows")
+    parser.add_argument("--partition-size", type=int, default=RECONCILE_PARTITION_SIZE)
+    args = parser.parse_args()
+
+    summary = reconcile(repair=args.repair, size=args.partition_size)
+    print(f"{'check':<8} {'rows':>10} {'partitions':>10} {'bad parts':>10} {'bad rows':>10} "
+          f"{'points off':>10} {'repaired':>10} {'ms':>8}")
+    for check in summary['checks']:
+        print(f"{check['check']:<8} {check['rows']:>10} {check['partitions']:>10} "
+              f"{check['mismatched_partitions']:>10} {check['mismatched_rows']:>10} "
+              f"{check['points_off']:>10} {check['repaired_rows']:>10} {check['ms']:>8.1f}")
+    for check in summary['checks']:
+        for key, stored, expected in check['sample']:
+            print(f"  {check['check']} {key}: stored {stored}, expected {expected}")
+    print(f"Current squads behind players.points (pending credit): "
+          f"{summary['behind_points']} points in {summary['behind_slots']} squad slots")
+    print(f"Current squads ahead of players.points (credited before a drop): "
+          f"{summary['ahead_points']} points in {summary['ahead_slots']} squad slots")
+    print(f"Total: {summary['total_ms']:.1f} ms")
+
+    if summary['mismatched_rows'] and not args.repair:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
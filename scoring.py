@@ -0,0 +1,616 @@
+"""
+User scoring: propagates players.points into squad_players.points_earned,
+squad_history.total_points and users.points.
+
+Three interchangeable modes are available (SCORING_MODE env var or the `mode`
+argument of update_user_points):
+
+- "set"  (default) a handful of set-based UPDATE ... JOIN statements
+- "loop" the original per-user / per-player implementation, kept as the
+         reference the set-based modes must agree with
+         (benchmarks/check_scoring_modes.py compares them)
+- "parallel" the set-based statements run per users.id range on a process
+         pool (SCORING_WORKERS processes, each with its own connection)
+
+A user's current squad is the one users.current_squad_id points at (kept by
+save_squad_history). Passing `player_ids` (the players whose points changed,
+e.g. both clubs of a finished match) restricts scoring to the current squads
+that contain at least one of them; every other squad has nothing new to
+credit.
+
+The set-based modes commit every SCORING_CHUNK_SIZE users rather than once per
+run, so user / squad rows are only locked for the duration of one chunk.
+
+Each run logs one summary record (users touched, points added, duration);
+per-user / per-player detail is logged at DEBUG (SCORING_DEBUG=1).
+"""
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import get_database_connection
+from pymysql.cursors import DictCursor
+from log_config import get_logger
+
+log = get_logger("scoring")
+
+SCORING_MODE = os.getenv("SCORING_MODE", "set")
+SCORING_CHUNK_SIZE = int(os.getenv("SCORING_CHUNK_SIZE", "500"))  # Users per transaction
+SCORING_LOCK_NAME = "isl_fantasy_scoring"
+SCORING_LOCK_TIMEOUT = 600
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "4"))
+# Partitions per worker process; more, smaller ranges even out skewed ranges
+PARTITIONS_PER_WORKER = int(os.getenv("SCORING_PARTITIONS_PER_WORKER", "4"))
+
+# Bumped after every successful scoring run in this process, so caches of user
+# points (see user_profile.py) know to refresh
+_scoring_version = 0
+
+
+def scoring_version():
+    return _scoring_version
+
+
+def bump_scoring_version():
+    """Also called by the app when a background worker finished a scoring run"""
+    global _scoring_version
+    _scoring_version += 1
+
+
+def update_user_points(mode=None, player_ids=None, progress=None):
+    """Update points for all users based on their current squad's performance"""
+    return run_scoring(mode, player_ids, progress) is not None
+
+
+def run_scoring(mode=None, player_ids=None, progress=None):
+    """
+    update_user_points() returning the run summary ({'users', 'squads',
+    'points'}) instead of a bool, or None if the run failed. `progress`, if
+    given, is called as progress(done, total) while the run advances.
+    """
+    mode = mode or SCORING_MODE
+    if player_ids is not None:
+        player_ids = tuple(sorted(set(player_ids)))
+        if not player_ids:
+            return {'users': 0, 'squads': 0, 'points': 0}
+    if mode == "loop":
+        score = update_user_points_loop
+    elif mode == "set":
+        score = update_user_points_set_based
+    elif mode == "parallel":
+        score = update_user_points_parallel
+    else:
+        raise ValueError(f"Unknown scoring mode: {mode}")
+
+    started = time.perf_counter()
+    summary = score(player_ids, progress)
+    duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    scope = len(player_ids) if player_ids else "all"
+    if summary is None:
+        log.error("Scoring run failed", extra={
+            'mode': mode, 'player_scope': scope, 'duration_ms': duration_ms
+        })
+        return None
+
+    bump_scoring_version()
+    log.info("Scoring run finished", extra={
+        'mode': mode, 'player_scope': scope, 'duration_ms': duration_ms, **summary
+    })
+    return summary
+
+
+def update_user_points_loop(player_ids=None, progress=None):
+    """
+    Update points for all users based on their current squad's performance, one
+    user at a time. Returns {'users', 'squads', 'points'} credited, or None on error.
+    """
+    debug = log.isEnabledFor(logging.DEBUG)
+    conn = get_database_connection()
+    cursor = conn.cursor(DictCursor)
+    
+    try:
+        # Get all users with their latest squad
+        if player_ids:
+            cursor.execute("""
+                SELECT DISTINCT u.id as user_id, u.username
+                FROM users u
+                JOIN squad_players sp ON sp.squad_id = u.current_squad_id
+                WHERE sp.player_id IN %s
+            """, (player_ids,))
+        else:
+            cursor.execute("""
+                SELECT u.id as user_id, u.username
+                FROM users u
+                WHERE u.current_squad_id IS NOT NULL
+            """)
+        users = cursor.fetchall()
+        users_touched = 0
+        points_added = 0
+        
+        log.debug("Users with squads to score", extra={'users': len(users)})
+        
+        for done, user in enumerate(users):
+            if progress and done % 100 == 0:
+                progress(done, len(users))
+
+            # Get user's latest squad
+            cursor.execute("""
+                SELECT 
+                    sh.id as squad_id,
+                    p.id as player_id,
+                    p.name as player_name,
+                    p.points as player_points,
+                    COALESCE(sp.points_earned, 0) as points_already_earned
+                FROM users u
+                JOIN squad_history sh ON sh.id = u.current_squad_id
+                JOIN squad_players sp ON sh.id = sp.squad_id
+                JOIN players p ON sp.player_id = p.id
+                WHERE u.id = %s
+            """, (user['user_id'],))
+            
+            squad = cursor.fetchall()
+            
+            if squad:
+                total_new_points = 0
+                
+                # Calculate new points earned
+                for player in squad:
+                    points_to_add = player['player_points'] - player['points_already_earned']
+                    if debug:
+                        log.debug("Player points", extra={
+                            'user_id': user['user_id'],
+                            'squad_id': player['squad_id'],
+                            'player_id': player['player_id'],
+                            'points': player['player_points'],
+                            'earned': player['points_already_earned'],
+                            'delta': points_to_add,
+                        })
+                    
+                    if points_to_add > 0:
+                        total_new_points += points_to_add
+                        
+                        # Update points_earned in squad_players
+                        cursor.execute("""
+                            UPDATE squad_players 
+                            SET points_earned = %s
+                            WHERE squad_id = %s AND player_id = %s
+                        """, (player['player_points'], player['squad_id'], player['player_id']))
+                
+                if debug:
+                    log.debug("Squad scored", extra={
+                        'user_id': user['user_id'],
+                        'squad_id': squad[0]['squad_id'],
+                        'delta': total_new_points,
+                    })
+                
+                if total_new_points > 0:
+                    # Update total points for the squad
+                    cursor.execute("""
+                        UPDATE squad_history
+                        SET total_points = total_points + %s
+                        WHERE id = %s
+                    """, (total_new_points, squad[0]['squad_id']))
+                    
+                    # Update user's total points
+                    cursor.execute("""
+                        UPDATE users
+                        SET points = points + %s
+                        WHERE id = %s
+                    """, (total_new_points, user['user_id']))
+                    users_touched += 1
+                    points_added += total_new_points
+            elif debug:
+                log.debug("No current squad found", extra={'user_id': user['user_id']})
+        
+        conn.commit()
+        if progress:
+            progress(len(users), len(users))
+        return {'users': users_touched, 'squads': users_touched, 'points': points_added}
+        
+    except Exception:
+        log.exception("Error updating user points")
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# Squad rows whose points still have to be credited: per current squad
+# (users.current_squad_id), the sum of (players.points - points_earned) over
+# players whose points went up since they were last credited. Mirrors the
+# `points_to_add > 0` filter of the loop.
+_LATEST_SQUAD_DELTAS = """
+    INSERT INTO score_delta (squad_id, user_id, delta)
+    SELECT sh.id, sh.user_id, SUM(p.points - COALESCE(sp.points_earned, 0))
+    FROM users u
+    JOIN squad_history sh ON sh.id = u.current_squad_id
+    JOIN squad_players sp ON sp.squad_id = sh.id
+    JOIN players p ON p.id = sp.player_id
+    WHERE p.points > COALESCE(sp.points_earned, 0)
+    GROUP BY sh.id, sh.user_id
+"""
+
+# Match-scoped variant: only current squads that contain one of the changed
+# players (squad_players.player_id is indexed) are read.
+_TOUCHED_SQUAD_DELTAS = """
+    INSERT INTO score_delta (squad_id, user_id, delta)
+    SELECT sh.id, sh.user_id, SUM(p.points - COALESCE(sp.points_earned, 0))
+    FROM (
+        SELECT DISTINCT squad_id
+        FROM squad_players
+        WHERE player_id IN %(player_ids)s
+    ) touched
+    JOIN squad_history sh ON sh.id = touched.squad_id
+    JOIN users u ON u.id = sh.user_id AND u.current_squad_id = sh.id
+    JOIN squad_players sp ON sp.squad_id = sh.id
+    JOIN players p ON p.id = sp.player_id
+    WHERE p.points > COALESCE(sp.points_earned, 0)
+    GROUP BY sh.id, sh.user_id
+"""
+
+
+# Statements _apply_score_deltas() reports progress over
+_SET_BASED_STEPS = 4
+
+
+def _apply_score_deltas(cursor, deltas_sql, params=(), progress=None):
+    """Fill the score_delta temp table and apply it; returns (users, squads, points)"""
+    def step(done):
+        if progress:
+            progress(done, _SET_BASED_STEPS)
+
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS score_delta")
+    cursor.execute("""
+        CREATE TEMPORARY TABLE score_delta (
+            squad_id INT PRIMARY KEY,
+            user_id INT NOT NULL,
+            delta INT NOT NULL
+        )
+    """)
+    try:
+        step(0)
+        cursor.execute(deltas_sql, params)
+        step(1)
+
+        cursor.execute("""
+            UPDATE squad_players sp
+            JOIN score_delta d ON d.squad_id = sp.squad_id
+            JOIN players p ON p.id = sp.player_id
+            SET sp.points_earned = p.points
+            WHERE p.points > COALESCE(sp.points_earned, 0)
+        """)
+        step(2)
+
+        cursor.execute("""
+            UPDATE squad_history sh
+            JOIN score_delta d ON d.squad_id = sh.id
+            SET sh.total_points = sh.total_points + d.delta
+        """)
+        step(3)
+
+        cursor.execute("""
+            UPDATE users u
+            JOIN (
+                SELECT user_id, SUM(delta) AS delta
+                FROM score_delta
+                GROUP BY user_id
+            ) d ON d.user_id = u.id
+            SET u.points = u.points + d.delta
+        """)
+        step(4)
+
+        cursor.execute("SELECT COUNT(DISTINCT user_id), COUNT(*), COALESCE(SUM(delta), 0) FROM score_delta")
+        users, squads, points = cursor.fetchone()
+        return users, squads, int(points)
+    finally:
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS score_delta")
+
+
+# Range-restricted variants of the two statements above, used per chunk of
+# users (and per partition in parallel mode). The users.id range is the
+# driving access path (primary key range scan).
+_RANGE_SQUAD_DELTAS = """
+    INSERT INTO score_delta (squad_id, user_id, delta)
+    SELECT sh.id, sh.user_id, SUM(p.points - COALESCE(sp.points_earned, 0))
+    FROM users u
+    JOIN squad_history sh ON sh.id = u.current_squad_id
+    JOIN squad_players sp ON sp.squad_id = sh.id
+    JOIN players p ON p.id = sp.player_id
+    WHERE u.id BETWEEN %(lo)s AND %(hi)s
+      AND p.points > COALESCE(sp.points_earned, 0)
+    GROUP BY sh.id, sh.user_id
+"""
+
+_RANGE_TOUCHED_SQUAD_DELTAS = """
+    INSERT INTO score_delta (squad_id, user_id, delta)
+    SELECT sh.id, sh.user_id, SUM(p.points - COALESCE(sp.points_earned, 0))
+    FROM users u
+    JOIN squad_history sh ON sh.id = u.current_squad_id
+    JOIN squad_players sp ON sp.squad_id = sh.id
+    JOIN players p ON p.id = sp.player_id
+    WHERE u.id BETWEEN %(lo)s AND %(hi)s
+      AND p.points > COALESCE(sp.points_earned, 0)
+      AND EXISTS (
+          SELECT 1 FROM squad_players touched
+          WHERE touched.squad_id = sh.id AND touched.player_id IN %(player_ids)s
+      )
+    GROUP BY sh.id, sh.user_id
+"""
+
+
+
+def update_user_points_set_based(player_ids=None, progress=None, chunk_size=None):
+    """
+    Same bookkeeping as update_user_points_loop() in a few set-based statements.
+    Returns {'users', 'squads', 'points'} credited, or None on error.
+
+    Users are scored in chunks of `chunk_size` (SCORING_CHUNK_SIZE) ids, one
+    transaction per chunk, so no row stays locked for longer than one chunk
+    takes. Each chunk commits together with the run's checkpoint in
+    scoring_runs; a run interrupted by a crash is resumed from its checkpoint
+    before the next one starts. Nothing can be credited twice either way:
+    points_earned is committed with the totals it was added to.
+    A match-scoped run (player_ids) chunks only the users whose current squad
+    holds one of the players. chunk_size=0 scores everything in a single
+    transaction.
+    """
+    chunk_size = SCORING_CHUNK_SIZE if chunk_size is None else chunk_size
+    conn = get_database_connection()
+    cursor = conn.cursor()
+
+    try:
+        # One run at a time: chunked runs keep a single checkpoint to resume, and
+        # season_recompute / reconcile --repair must not interleave with scoring
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (SCORING_LOCK_NAME, SCORING_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Timed out waiting for another scoring run to finish")
+        try:
+            if not chunk_size:
+                if player_ids:
+                    users, squads, points = _apply_score_deltas(
+                        cursor, _TOUCHED_SQUAD_DELTAS, {'player_ids': player_ids}, progress
+                    )
+                else:
+                    users, squads, points = _apply_score_deltas(cursor, _LATEST_SQUAD_DELTAS, progress=progress)
+                conn.commit()
+                return {'users': users, 'squads': squads, 'points': points}
+
+            totals = {'users': 0, 'squads': 0, 'points': 0}
+            for run_id, run_player_ids, last_user_id in _interrupted_runs(cursor):
+                log.warning("Resuming interrupted scoring run", extra={
+                    'run_id': run_id, 'last_user_id': last_user_id
+                })
+                _merge(totals, _complete_run(conn, cursor, run_id, last_user_id, run_player_ids, chunk_size))
+
+            cursor.execute(
+                "INSERT INTO scoring_runs (player_ids) VALUES (%s)",
+                (json.dumps(player_ids) if player_ids else None,)
+            )
+            run_id = cursor.lastrowid
+            conn.commit()
+            _merge(totals, _complete_run(conn, cursor, run_id, 0, player_ids, chunk_size, progress))
+            return totals
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (SCORING_LOCK_NAME,))
+            cursor.fetchone()
+    except Exception:
+        log.exception("Error updating user points")
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _merge(totals, counts):
+    for key in ('users', 'squads', 'points'):
+        totals[key] += counts[key]
+
+
+def _interrupted_runs(cursor):
+    cursor.execute("""
+        SELECT id, player_ids, last_user_id
+        FROM scoring_runs
+        WHERE status = 'running'
+        ORDER BY id
+    """)
+    return [
+        (run_id, tuple(json.loads(player_ids)) if player_ids else None, last_user_id)
+        for run_id, player_ids, last_user_id in cursor.fetchall()
+    ]
+
+
+def _next_chunk_end(cursor, after, chunk_size, upto):
+    """Highest id among the next `chunk_size` users after `after` (at most `upto`)"""
+    cursor.execute("""
+        SELECT MAX(id) FROM (
+            SELECT id FROM users
+            WHERE id > %s AND id <= %s
+            ORDER BY id
+            LIMIT %s
+        ) chunk
+    """, (after, upto, chunk_size))
+    return cursor.fetchone()[0]
+
+
+def _touched_user_ids(cursor, after, upto, player_ids):
+    """Sorted ids (after < id <= upto) of users whose current squad holds one of player_ids"""
+    cursor.execute("""
+        SELECT DISTINCT sh.user_id
+        FROM squad_players sp
+        JOIN squad_history sh ON sh.id = sp.squad_id
+        JOIN users u ON u.id = sh.user_id AND u.current_squad_id = sh.id
+        WHERE sp.player_id IN %s
+          AND sh.user_id > %s AND sh.user_id <= %s
+        ORDER BY sh.user_id
+    """, (tuple(player_ids), after, upto))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _chunk_ends(cursor, after, upto, player_ids, chunk_size):
+    """
+    Last user id of each successive chunk. Match-scoped runs chunk the users
+    they touch (read once through squad_players.player_id), so the number of
+    commits follows the size of the match, not of the league.
+    """
+    if player_ids:
+        touched = _touched_user_ids(cursor, after, upto, player_ids)
+        for i in range(0, len(touched), chunk_size):
+            yield touched[min(i + chunk_size, len(touched)) - 1]
+        return
+    while True:
+        hi = _next_chunk_end(cursor, after, chunk_size, upto)
+        if hi is None:
+            return
+        yield hi
+        after = hi
+
+
+def _score_in_chunks(conn, cursor, after, upto, player_ids, chunk_size, run_id=None, progress=None):
+    """
+    Score users with after < id <= upto, committing every `chunk_size` users
+    (of those touched, for a match-scoped run). With a run_id, the
+    scoring_runs checkpoint advances in the same commit.
+    """
+    totals = {'users': 0, 'squads': 0, 'points': 0}
+    start = after
+    for hi in _chunk_ends(cursor, after, upto, player_ids, chunk_size):
+        params = {'lo': after + 1, 'hi': hi}
+        if player_ids:
+            params['player_ids'] = player_ids
+            sql = _RANGE_TOUCHED_SQUAD_DELTAS
+        else:
+            sql = _RANGE_SQUAD_DELTAS
+        users, squads, points = _apply_score_deltas(cursor, sql, params)
+
+        if run_id is not None:
+            cursor.execute("""
+                UPDATE scoring_runs
+                SET last_user_id = %s, users = users + %s, squads = squads + %s,
+                    points = points + %s, updated_at = NOW()
+                WHERE id = %s
+            """, (hi, users, squads, points, run_id))
+        conn.commit()
+
+        _merge(totals, {'users': users, 'squads': squads, 'points': points})
+        after = hi
+        if progress:
+            progress(after - start, upto - start)
+    if progress and after != upto:
+        progress(upto - start, upto - start)
+    return totals
+
+
+def _complete_run(conn, cursor, run_id, last_user_id, player_ids, chunk_size, progress=None):
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM users")
+    upto = cursor.fetchone()[0]
+    totals = _score_in_chunks(conn, cursor, last_user_id, upto, player_ids, chunk_size, run_id, progress)
+    cursor.execute("""
+        UPDATE scoring_runs
+        SET status = 'completed', finished_at = NOW()
+        WHERE id = %s
+    """, (run_id,))
+    conn.commit()
+    return totals
+
+
+def partition_ranges(lo, hi, parts):
+    """Split the id range [lo, hi] into at most `parts` contiguous ranges"""
+    if lo is None or hi is None:
+        return []
+    size = max(1, -(-(hi - lo + 1) // parts))
+    return [(start, min(start + size - 1, hi)) for start in range(lo, hi + 1, size)]
+
+
+def score_partition(lo, hi, player_ids=None, chunk_size=None):
+    """
+    Score the current squads of users with lo <= id <= hi on this process's
+    own connection, committing every `chunk_size` users. Returns
+    {'users', 'squads', 'points'}.
+    """
+    chunk_size = chunk_size or SCORING_CHUNK_SIZE or (hi - lo + 1)
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        return _score_in_chunks(conn, cursor, lo - 1, hi, player_ids, chunk_size)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def update_user_points_parallel(player_ids=None, progress=None, workers=None):
+    """
+    Set-based scoring split into users.id ranges scored concurrently on a
+    process pool. Partitions touch disjoint squads and users rows, so they
+    don't contend for row locks.
+
+    Each partition commits in chunks of SCORING_CHUNK_SIZE users. If one fails
+    the others stay applied; that is safe because points_earned records what
+    was credited, so the next run picks up exactly the squads that were
+    missed. The scoring lock is held for the whole run, like the other modes.
+    Returns the merged {'users', 'squads', 'points', 'partitions', 'workers'},
+    or None on error.
+    """
+    workers = workers or SCORING_WORKERS
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (SCORING_LOCK_NAME, SCORING_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            log.error("Timed out waiting for another scoring run to finish")
+            return None
+        try:
+            # Primary key bounds (no scan); users without a squad just score nothing
+            cursor.execute("SELECT MIN(id), MAX(id) FROM users")
+            lo, hi = cursor.fetchone()
+            conn.commit()
+            return _score_partitions(lo, hi, player_ids, progress, workers)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (SCORING_LOCK_NAME,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _score_partitions(lo, hi, player_ids, progress, workers):
+    ranges = partition_ranges(lo, hi, workers * PARTITIONS_PER_WORKER)
+    totals = {'users': 0, 'squads': 0, 'points': 0, 'partitions': len(ranges), 'workers': workers}
+    if progress:
+        progress(0, len(ranges))
+
+    failed = 0
+    # spawn: children must not inherit the parent's pooled sockets or threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(score_partition, start, end, player_ids): (start, end)
+            for start, end in ranges
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            start, end = futures[future]
+            try:
+                partition = future.result()
+            except Exception:
+                failed += 1
+                log.exception("Scoring partition failed", extra={'user_id_from': start, 'user_id_to': end})
+            else:
+                for key in ('users', 'squads', 'points'):
+                    totals[key] += partition[key]
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Scoring partition finished", extra={
+                        'user_id_from': start, 'user_id_to': end, **partition
+                    })
+            if progress:
+                progress(done, len(ranges))
+
+    if failed:
+        log.error("Scoring partitions failed", extra={'failed': failed, **totals})
+        return None
+    return totals
@@ -0,0 +1,91 @@
+"""
+Declarative scoring rules.
+
+Point values live in scoring_rules.json (or the file SCORING_RULES_PATH points
+at): for every match stat, the points per unit, optionally per position, with
+"default" for positions not listed:
+
+    {"goals": {"default": 5}, "clean_sheet": {"GK": 4, "DEF": 3, "default": 0}, ...}
+
+load_rules() compiles a rules file into a ScoringRules object holding a
+(position x stat) weight matrix. A whole frame of player match stats is
+scored in one pass: each row's stat vector dotted with its position's weights.
+The same object serves the admin form (one match), season backfills and
+what-if runs with an alternative rules file (see season_recompute.py).
+"""
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+POSITIONS = ('GK', 'DEF', 'MID', 'FWD')
+STAT_COLUMNS = ('goals', 'assists', 'yellows', 'reds', 'clean_sheet', 'appeared')
+
+SCORING_RULES_PATH = os.getenv(
+    "SCORING_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoring_rules.json")
+)
+
+
+class ScoringRules:
+    """Rules compiled to a weight matrix: weights[position index, stat index]"""
+
+    def __init__(self, values, source=None):
+        self.values = values
+        self.source = source
+        self.weights = np.zeros((len(POSITIONS), len(STAT_COLUMNS)), dtype=np.int64)
+
+        unknown = set(values) - set(STAT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown stats in scoring rules: {', '.join(sorted(unknown))}")
+        for j, stat in enumerate(STAT_COLUMNS):
+            per_position = values.get(stat, {})
+            bad = set(per_position) - set(POSITIONS) - {'default'}
+            if bad:
+                raise ValueError(f"Unknown positions for {stat}: {', '.join(sorted(bad))}")
+            for i, position in enumerate(POSITIONS):
+                self.weights[i, j] = int(per_position.get(position, per_position.get('default', 0)))
+
+        self._position_index = {position: i for i, position in enumerate(POSITIONS)}
+
+    def points(self, position, stat):
+        """Points per unit of `stat` for a player in `position`"""
+        return int(self.weights[self._position_index[position], STAT_COLUMNS.index(stat)])
+
+    def score_frame(self, frame):
+        """
+        Points for every row of a frame with a 'position' column and the stat
+        columns, as an int64 array. Unknown positions score 0.
+        """
+        codes = frame['position'].map(self._position_index)
+        known = codes.notna().to_numpy()
+        counts = frame[list(STAT_COLUMNS)].to_numpy(dtype=np.int64)
+        points = np.zeros(len(frame), dtype=np.int64)
+        rows = codes[known].to_numpy(dtype=np.int64)
+        points[known] = np.einsum('ij,ij->i', counts[known], self.weights[rows])
+        return points
+
+    def table(self):
+        """Weights as a position x stat DataFrame (for display)"""
+        return pd.DataFrame(self.weights, index=list(POSITIONS), columns=list(STAT_COLUMNS))
+
+
+def load_rules(path=None):
+    path = path or SCORING_RULES_PATH
+    with open(path) as f:
+        return ScoringRules(json.load(f), source=path)
+
+
+_rules = None
+_rules_lock = threading.Lock()
+
+
+def get_rules():
+    """The active rules, compiled once per process"""
+    global _rules
+    if _rules is None:
+        with _rules_lock:
+            if _rules is None:
+                _rules = load_rules()
+    return _rules
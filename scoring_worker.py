@@ -0,0 +1,107 @@
+"""
+Background worker for the job queue (job_queue.py).
+
+Runs next to the Streamlit app on the same box:
+
+    python scoring_worker.py          # poll forever
+    python scoring_worker.py --once   # drain the queue and exit
+
+Jobs are claimed one at a time; progress is written back to the jobs table so
+the admin page can show it while the run is in flight.
+"""
+import os
+import sys
+import time
+from migrations import ensure_schema
+from job_queue import (
+    SCORE_MATCH, worker_name, claim_next_job, report_progress, finish_job,
+    fail_job, requeue_stale_jobs
+)
+from scoring import run_scoring
+from log_config import get_logger
+
+POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "2"))
+PROGRESS_INTERVAL = 1.0  # Seconds between progress writes
+
+log = get_logger("worker")
+
+
+def _progress_reporter(job_id):
+    """progress(done, total) callback that writes at most once per PROGRESS_INTERVAL"""
+    last_write = [0.0]
+
+    def progress(done, total):
+        now = time.monotonic()
+        if done == total or now - last_write[0] >= PROGRESS_INTERVAL:
+            last_write[0] = now
+            report_progress(job_id, done, total)
+
+    return progress
+
+
+def score_match(job):
+    """Credit squads holding players of the match's two clubs"""
+    payload = job['payload']
+    report_progress(job['id'], 0, message=f"Scoring match {payload['match_id']}")
+    summary = run_scoring(
+        player_ids=payload.get('player_ids'),
+        progress=_progress_reporter(job['id']),
+    )
+    if summary is None:
+        raise RuntimeError("Scoring run failed, see worker log")
+    return f"Scored {summary['users']} users, {summary['points']} points added"
+
+
+HANDLERS = {
+    SCORE_MATCH: score_match,
+}
+
+
+def run_job(job):
+    handler = HANDLERS.get(job['kind'])
+    extra = {'job_id': job['id'], 'kind': job['kind'], 'attempt': job['attempts']}
+    if handler is None:
+        fail_job(job, f"Unknown job kind: {job['kind']}")
+        log.error("Unknown job kind", extra=extra)
+        return
+
+    started = time.perf_counter()
+    log.info("Job started", extra=extra)
+    try:
+        message = handler(job)
+    except Exception as e:
+        log.exception("Job failed", extra=extra)
+        if not fail_job(job, str(e)):
+            log.warning("Job was reclaimed, outcome not recorded", extra=extra)
+        return
+    if not finish_job(job, message):
+        log.warning("Job was reclaimed, outcome not recorded", extra=extra)
+        return
+    log.info("Job finished", extra={
+        **extra, 'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+    })
+
+
+def work(once=False):
+    ensure_schema()
+    worker = worker_name()
+    log.info("Worker started", extra={'worker': worker})
+    while True:
+        requeued = requeue_stale_jobs()
+        if requeued:
+            log.warning("Requeued stale jobs", extra={'jobs': requeued})
+
+        job = claim_next_job(worker)
+        if job is not None:
+            run_job(job)
+            continue
+        if once:
+            return
+        time.sleep(POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    try:
+        work(once="--once" in sys.argv[1:])
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,271 @@
+"""
+Rebuild players.points and the squad / user totals from player_match_stats.
+
+players.points = baseline_points + the points of every recorded match, where a
+match's points are computed from its stats with the scoring rules
+(scoring_rules.py). The per-match points are computed for the whole season at
+once with pandas / NumPy; only rows whose value actually changes are written
+back (through a temporary table and one UPDATE ... JOIN each).
+
+Squad totals are then derived for current squads the way scoring credits them
+(points_earned is raised to the player's points, never lowered, so points a
+player later lost to cards stay credited; total_points = their sum) and
+users.points = the sum of their squads' totals. Historical squads keep what
+they were credited while current.
+
+    python season_recompute.py                          # recompute and write
+    python season_recompute.py --dry-run                # only report what would change
+    python season_recompute.py --rules new_rules.json   # backfill with other rules
+    python season_recompute.py --what-if new_rules.json # biggest player / user swings, read-only
+
+--rules writes points computed with the given file; point SCORING_RULES_PATH
+at it (or copy it over scoring_rules.json) before restarting the app so new
+match results use the same rules.
+
+The app's in-process player catalog refreshes on its next invalidation (e.g.
+the next match result); restart the app to pick the new points up at once.
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from config import get_database_connection
+from scoring_rules import STAT_COLUMNS, get_rules, load_rules
+from player_catalog import invalidate_player_catalog
+from scoring import SCORING_LOCK_NAME, SCORING_LOCK_TIMEOUT, bump_scoring_version
+from log_config import get_logger
+
+BATCH_SIZE = 5000
+
+log = get_logger("recompute")
+
+
+def _frame(cursor, sql, columns):
+    cursor.execute(sql)
+    return pd.DataFrame(list(cursor.fetchall()), columns=list(columns))
+
+
+def match_points(stats, rules=None):
+    """Points for every row of a stats frame with a position column"""
+    return pd.Series((rules or get_rules()).score_frame(stats), index=stats.index)
+
+
+def compute_season(players, stats, rules=None):
+    """
+    Returns (players with a new_points column, stats with a new_points column)
+    for frames shaped like the players / player_match_stats tables.
+    """
+    positions = players.set_index('id')['position']
+    stats = stats.assign(position=stats['player_id'].map(positions))
+    stats['new_points'] = match_points(stats, rules)
+
+    season = stats.groupby('player_id')['new_points'].sum()
+    players = players.assign(
+        new_points=players['baseline_points'] + players['id'].map(season).fillna(0).astype(np.int64)
+    )
+    return players, stats
+
+
+def _write_back(cursor, temp_table, key_columns, rows, update_sql):
+    """Bulk-load (key..., points) rows into a temp table and run update_sql against it"""
+    keys = ", ".join(f"{column} INT NOT NULL" for column in key_columns)
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {temp_table}")
+    cursor.execute(f"""
+        CREATE TEMPORARY TABLE {temp_table} (
+            {keys},
+            points INT NOT NULL,
+            PRIMARY KEY ({", ".join(key_columns)})
+        )
+    """)
+    try:
+        placeholders = ", ".join(["%s"] * (len(key_columns) + 1))
+        for start in range(0, len(rows), BATCH_SIZE):
+            cursor.executemany(
+                f"INSERT INTO {temp_table} VALUES ({placeholders})",
+                rows[start:start + BATCH_SIZE]
+            )
+        cursor.execute(update_sql)
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {temp_table}")
+
+
+def rebuild_squad_totals(cursor):
+    """Derive current squads' points_earned / total_points and users.points"""
+    # Same high-water mark as scoring: a rebuild of a scored league changes nothing
+    cursor.execute("""
+        UPDATE users u
+        JOIN squad_players sp ON sp.squad_id = u.current_squad_id
+        JOIN players p ON p.id = sp.player_id
+        SET sp.points_earned = GREATEST(COALESCE(sp.points_earned, 0), p.points)
+    """)
+    cursor.execute("""
+        UPDATE squad_history sh
+        JOIN (
+            SELECT sp.squad_id, SUM(sp.points_earned) AS total
+            FROM users u
+            JOIN squad_players sp ON sp.squad_id = u.current_squad_id
+            GROUP BY sp.squad_id
+        ) t ON t.squad_id = sh.id
+        SET sh.total_points = t.total
+    """)
+    cursor.execute("""
+        UPDATE users u
+        JOIN (
+            SELECT user_id, SUM(total_points) AS total
+            FROM squad_history
+            GROUP BY user_id
+        ) t ON t.user_id = u.id
+        SET u.points = t.total
+    """)
+
+
+def _load_season(cursor, lock_rows):
+    """(players, stats) frames; lock_rows adds FOR UPDATE"""
+    lock = "FOR UPDATE" if lock_rows else ""
+    players = _frame(cursor, f"""
+        SELECT id, position, baseline_points, points
+        FROM players
+        {lock}
+    """, ('id', 'position', 'baseline_points', 'points'))
+    stats = _frame(cursor, f"""
+        SELECT match_id, player_id, {", ".join(STAT_COLUMNS)}, points
+        FROM player_match_stats
+        {lock}
+    """, ('match_id', 'player_id') + STAT_COLUMNS + ('points',))
+    if stats.empty:
+        stats = stats.astype(np.int64)
+    return players, stats
+
+
+def simulate_rules(rules, top=10):
+    """
+    What-if: how would the season look under `rules`? Read-only. Returns the
+    total change, the biggest player swings and the biggest swings in users'
+    current squads (by the change in their players' points).
+    """
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        players, stats = _load_season(cursor, lock_rows=False)
+        squads = _frame(cursor, """
+            SELECT u.id AS user_id, u.username, u.points, sp.player_id
+            FROM users u
+            JOIN squad_players sp ON sp.squad_id = u.current_squad_id
+        """, ('user_id', 'username', 'points', 'player_id'))
+    finally:
+        cursor.close()
+        conn.close()
+
+    current, _ = compute_season(players, stats)
+    proposed, _ = compute_season(players, stats, rules)
+    players = current.assign(change=proposed['new_points'] - current['new_points'])
+
+    squads = squads.assign(change=squads['player_id'].map(players.set_index('id')['change']).fillna(0))
+    users = squads.groupby(['user_id', 'username', 'points'], as_index=False)['change'].sum()
+    users['change'] = users['change'].astype(np.int64)
+    users['rank_before'] = users['points'].rank(method='min', ascending=False).astype(np.int64)
+    users['rank_after'] = (users['points'] + users['change']).rank(method='min', ascending=False).astype(np.int64)
+
+    def movers(frame, columns):
+        order = frame['change'].abs().sort_values(ascending=False, kind='stable').index
+        return frame.loc[order[:top], columns].to_dict('records')
+
+    return {
+        'players_changed': int((players['change'] != 0).sum()),
+        'points_delta': int(players['change'].sum()),
+        'users_changed': int((users['change'] != 0).sum()),
+        'top_players': movers(players, ['id', 'position', 'new_points', 'change']),
+        'top_users': movers(users, ['user_id', 'username', 'points', 'change', 'rank_before', 'rank_after']),
+    }
+
+
+def recompute_season(dry_run=False, rules=None):
+    """Recompute everything from player_match_stats; returns a summary dict"""
+    started = time.perf_counter()
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        # Scoring runs must not interleave with the rebuild
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (SCORING_LOCK_NAME, SCORING_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError("Timed out waiting for a scoring run to finish")
+        try:
+            players, stats = _load_season(cursor, lock_rows=True)
+            loaded = time.perf_counter()
+
+            players, stats = compute_season(players, stats, rules)
+            changed_players = players[players['new_points'] != players['points'].fillna(0)]
+            changed_stats = stats[stats['new_points'] != stats['points']]
+            computed = time.perf_counter()
+
+            summary = {
+                'players': len(players),
+                'stat_rows': len(stats),
+                'players_changed': len(changed_players),
+                'stat_rows_changed': len(changed_stats),
+                'points_delta': int((changed_players['new_points'] - changed_players['points'].fillna(0)).sum()),
+                'load_ms': round((loaded - started) * 1000, 1),
+                'compute_ms': round((computed - loaded) * 1000, 1),
+            }
+            if dry_run:
+                conn.rollback()
+                return summary
+
+            if len(changed_stats):
+                _write_back(cursor, "recomputed_match_points", ('match_id', 'player_id'),
+                            changed_stats[['match_id', 'player_id', 'new_points']].values.tolist(), """
+                    UPDATE player_match_stats s
+                    JOIN recomputed_match_points r
+                      ON r.match_id = s.match_id AND r.player_id = s.player_id
+                    SET s.points = r.points
+                """)
+            if len(changed_players):
+                _write_back(cursor, "recomputed_player_points", ('id',),
+                            changed_players[['id', 'new_points']].values.tolist(), """
+                    UPDATE players p
+                    JOIN recomputed_player_points r ON r.id = p.id
+                    SET p.points = r.points
+                """)
+            rebuild_squad_totals(cursor)
+            conn.commit()
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (SCORING_LOCK_NAME,))
+            cursor.fetchone()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    invalidate_player_catalog()
+    bump_scoring_version()
+    summary['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    log.info("Season recomputed", extra=summary)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--rules", help="scoring rules file to recompute with (default: the active rules)")
+    parser.add_argument("--what-if", metavar="RULES", help="compare a rules file against the active rules, read-only")
+    parser.add_argument("--top", type=int, default=10, help="movers to list with --what-if")
+    args = parser.parse_args()
+
+    if args.what_if:
+        result = simulate_rules(load_rules(args.what_if), top=args.top)
+        for key in ('players_changed', 'points_delta', 'users_changed'):
+            print(f"{key:>18}: {result[key]}")
+        print("\nBiggest player changes")
+        for row in result['top_players']:
+            print(f"  player {row['id']:>6} {row['position']:<3} {row['new_points']:>6} -> "
+                  f"{row['new_points'] + row['change']:<6} ({row['change']:+d})")
+        print("\nBiggest user changes (current squads)")
+        for row in result['top_users']:
+            print(f"  {row['username']:<24} {row['points']:>6} -> {row['points'] + row['change']:<6} "
+                  f"({row['change']:+d})  rank {row['rank_before']} -> {row['rank_after']}")
+    else:
+        result = recompute_season(dry_run=args.dry_run, rules=load_rules(args.rules) if args.rules else None)
+        for key, value in result.items():
+            print(f"{key:>18}: {value}")
@@ -0,0 +1,95 @@
+"""
+Maintained player selection counters (player_selection_stats).
+
+- current_owners:   users whose current squad contains the player
+- total_selections: squads (over all history) that contained the player
+- ownership %:      current_owners / league_counters['active_managers']
+
+save_squad_history() keeps these up to date in its own transaction through
+record_squad_change(). rebuild_player_selection_stats() recomputes everything
+from squad history for reconciliation:
+
+    python selection_stats.py rebuild
+"""
+import sys
+from config import get_database_connection
+
+ACTIVE_MANAGERS = 'active_managers'
+
+
+def record_squad_change(cursor, previous_squad_id, new_player_ids):
+    """
+    Counter bookkeeping for a user replacing `previous_squad_id` (None for a
+    first squad) with a squad of `new_player_ids`. Runs on the caller's cursor,
+    inside the caller's transaction.
+    """
+    if previous_squad_id is None:
+        cursor.execute("""
+            INSERT INTO league_counters (name, value) VALUES (%s, 1)
+            ON DUPLICATE KEY UPDATE value = value + 1
+        """, (ACTIVE_MANAGERS,))
+    else:
+        cursor.execute("""
+            UPDATE player_selection_stats s
+            JOIN squad_players sp ON sp.player_id = s.player_id
+            SET s.current_owners = s.current_owners - 1
+            WHERE sp.squad_id = %s
+        """, (previous_squad_id,))
+
+    cursor.executemany("""
+        INSERT INTO player_selection_stats (player_id, current_owners, total_selections)
+        VALUES (%s, 1, 1)
+        ON DUPLICATE KEY UPDATE
+            current_owners = current_owners + 1,
+            total_selections = total_selections + 1
+    """, [(player_id,) for player_id in new_player_ids])
+
+
+def rebuild_stats(cursor):
+    """Recompute every counter from squad history"""
+    cursor.execute("DELETE FROM player_selection_stats")
+    cursor.execute("""
+        INSERT INTO player_selection_stats (player_id, current_owners, total_selections)
+        SELECT p.id, COALESCE(cur.owners, 0), COALESCE(tot.selections, 0)
+        FROM players p
+        LEFT JOIN (
+            SELECT sp.player_id, COUNT(*) AS owners
+            FROM users u
+            JOIN squad_players sp ON sp.squad_id = u.current_squad_id
+            GROUP BY sp.player_id
+        ) cur ON cur.player_id = p.id
+        LEFT JOIN (
+            SELECT player_id, COUNT(*) AS selections
+            FROM squad_players
+            GROUP BY player_id
+        ) tot ON tot.player_id = p.id
+    """)
+    cursor.execute("""
+        INSERT INTO league_counters (name, value)
+        SELECT %s, COUNT(*) FROM users WHERE current_squad_id IS NOT NULL
+        ON DUPLICATE KEY UPDATE value = VALUES(value)
+    """, (ACTIVE_MANAGERS,))
+
+
+def rebuild_player_selection_stats():
+    """Admin reconciliation: rebuild the counters in one transaction"""
+    conn = get_database_connection()
+    cursor = conn.cursor()
+    try:
+        rebuild_stats(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["rebuild"]:
+        rebuild_player_selection_stats()
+        print("Player selection stats rebuilt from squad history")
+    else:
+        print("usage: python selection_stats.py rebuild")
+        sys.exit(2)
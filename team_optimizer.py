@@ -0,0 +1,120 @@
+"""
+Exact budget-constrained squad selection.
+
+Picks the squad that maximises the summed player rating for a formation under
+a budget, as a knapsack over price. Prices are converted to integer units
+(0.1Cr, or 0.01Cr if any price needs it). For each position we compute the
+best rating for "exactly k players costing exactly c units". The positions are
+then merged with a max-plus convolution over cost.
+"""
+import math
+import numpy as np
+
+FORMATION_442 = {'GK': 1, 'DEF': 4, 'MID': 4, 'FWD': 2}
+
+
+def _price_unit(players):
+    """Coarsest unit (0.1 or 0.01 Cr) in which every price is a whole number"""
+    for unit in (0.1, 0.01):
+        if all(abs(p['price'] / unit - round(p['price'] / unit)) < 1e-6 for p in players):
+            return unit
+    return 0.01
+
+
+def _best_by_cost(costs, ratings, count, capacity):
+    """
+    For one position: best[c] = max rating of exactly `count` players whose
+    prices sum to exactly c units (-inf if impossible), plus the per-player
+    decisions needed to rebuild the selection.
+    """
+    best = np.full((count + 1, capacity + 1), -np.inf)
+    best[0, 0] = 0.0
+    taken = np.zeros((len(costs), count + 1, capacity + 1), dtype=bool)
+
+    for i, (cost, rating) in enumerate(zip(costs, ratings)):
+        if cost > capacity:
+            continue
+        # Descending k so each player is used at most once
+        for k in range(count, 0, -1):
+            candidate = best[k - 1, :capacity + 1 - cost] + rating
+            improved = candidate > best[k, cost:]
+            best[k, cost:][improved] = candidate[improved]
+            taken[i, k, cost:] = improved
+
+    return best[count], taken
+
+
+def _rebuild(taken, costs, count, cost):
+    chosen = []
+    k = count
+    for i in range(len(costs) - 1, -1, -1):
+        if k == 0:
+            break
+        if taken[i, k, cost]:
+            chosen.append(i)
+            k -= 1
+            cost -= costs[i]
+    return chosen
+
+
+def optimize_team(players, budget=100.0, formation=FORMATION_442, rating_key='rating'):
+    """
+    Rating-maximising squad for `formation` within `budget`.
+
+    Returns {position: [players sorted by rating]} plus 'total_cost' and
+    'total_rating', or None if no squad fits the budget.
+    """
+    if not players:
+        return None
+    unit = _price_unit(players)
+    capacity = int(math.floor(budget / unit + 1e-6))
+
+    by_position = {}
+    for position, count in formation.items():
+        pool = [p for p in players if p['position'] == position]
+        if len(pool) < count:
+            return None
+        costs = [int(round(p['price'] / unit)) for p in pool]
+        ratings = [float(p[rating_key]) for p in pool]
+        best, taken = _best_by_cost(costs, ratings, count, capacity)
+        by_position[position] = (pool, costs, best, taken)
+
+    # Merge positions: combined[c] = best total rating spending exactly c units,
+    # splits[j][c] = units given to the first j positions at that point
+    positions = list(formation)
+    combined = by_position[positions[0]][2]
+    splits = []
+    for position in positions[1:]:
+        best = by_position[position][2]
+        merged = np.full(capacity + 1, -np.inf)
+        split = np.zeros(capacity + 1, dtype=np.int64)
+        for spent in np.flatnonzero(np.isfinite(combined)):
+            candidate = combined[spent] + best[:capacity + 1 - spent]
+            improved = candidate > merged[spent:]
+            merged[spent:][improved] = candidate[improved]
+            split[spent:][improved] = spent
+        combined = merged
+        splits.append(split)
+
+    if not np.isfinite(combined).any():
+        return None
+    total_units = int(np.argmax(combined))
+
+    # Walk the splits back to find each position's share of the budget
+    shares = {}
+    remaining = total_units
+    for position, split in zip(reversed(positions[1:]), reversed(splits)):
+        before = int(split[remaining])
+        shares[position] = remaining - before
+        remaining = before
+    shares[positions[0]] = remaining
+
+    squad = {}
+    for position in positions:
+        pool, costs, _, taken = by_position[position]
+        chosen = _rebuild(taken, costs, formation[position], shares[position])
+        squad[position] = sorted((pool[i] for i in chosen), key=lambda p: p[rating_key], reverse=True)
+
+    squad['total_cost'] = sum(p['price'] for position in positions for p in squad[position])
+    squad['total_rating'] = float(combined[total_units])
+    return squad
@@ -0,0 +1,80 @@
+"""
+Per-session cache of the logged-in user's profile (id, username, role, points).
+
+The profile is loaded at login and kept in st.session_state.user. It is
+refreshed from the database only when it is older than PROFILE_TTL seconds, or
+when a scoring run in this process has changed points since it was loaded.
+Pages read the role and points from here instead of querying users on every
+rerun.
+"""
+import os
+import time
+import streamlit as st
+from config import get_database_connection
+from pymysql.cursors import DictCursor
+from scoring import scoring_version
+
+PROFILE_TTL = float(os.getenv("PROFILE_TTL", "60"))
+
+
+def _fetch_profile(user_id):
+    conn = get_database_connection()
+    cursor = conn.cursor(DictCursor)
+    try:
+        cursor.execute("""
+            SELECT id, username, points, is_admin
+            FROM users
+            WHERE id = %s
+        """, (user_id,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _store(row, version):
+    st.session_state.user = {
+        'id': row['id'],
+        'username': row['username'],
+        'points': row['points'],
+        'is_admin': bool(row.get('is_admin')),
+    }
+    st.session_state.profile_loaded_at = time.monotonic()
+    st.session_state.profile_scoring_version = version
+
+
+def start_session(user_row):
+    """Cache the profile from the users row returned by login"""
+    _store(user_row, scoring_version())
+
+
+def end_session():
+    st.session_state.user = None
+    st.session_state.pop('profile_loaded_at', None)
+    st.session_state.pop('profile_scoring_version', None)
+
+
+def current_profile():
+    """The logged-in user's profile, refreshed if stale; None when logged out"""
+    profile = st.session_state.get('user')
+    if not profile:
+        return None
+    version = scoring_version()
+    loaded_at = st.session_state.get('profile_loaded_at', 0)
+    if (time.monotonic() - loaded_at < PROFILE_TTL
+            and st.session_state.get('profile_scoring_version') == version):
+        return profile
+
+    row = _fetch_profile(profile['id'])
+    if row is None:
+        # Account no longer exists
+        end_session()
+        return None
+    _store(row, version)
+    return st.session_state.user
+
+
+def is_admin_user():
+    """Admin check against the refreshed profile, so a revoked flag takes effect"""
+    profile = current_profile()
+    return bool(profile and profile['is_admin'])